@@ -1,50 +1,155 @@
 import ee
+import os
+import random
+import re
 import time
 
 # Name of the Google Earth Engine project. Replace with your project name if needed.
 USER_PROJECT = ""
 
-def authenticate_earth_engine():
+# Optional path to a service account JSON key. When set, it is used instead of the user OAuth flow,
+# so (re)authentication is a local file read rather than a browser round-trip.
+SERVICE_ACCOUNT_JSON = os.environ.get("SERVICE_ACCOUNT_JSON")
+
+# Set EE_HIGH_VOLUME=1 to use the high-volume endpoint, meant for many concurrent automated requests
+# such as the batched time-series extraction.
+EE_HIGH_VOLUME = os.environ.get("EE_HIGH_VOLUME", "").lower() in ("1", "true", "yes")
+HIGH_VOLUME_URL = "https://earthengine-highvolume.googleapis.com"
+
+# Earth Engine error messages that retrying cannot fix: missing permissions, an account not signed up, or a
+# missing, invalid or unregistered project (e.g. "Project 'projects/x' not found or deleted."). Other errors,
+# including 404s for temporarily missing resources, are retried.
+UNRECOVERABLE_ERROR = re.compile(
+    r"permission|not signed up|not registered|invalid project|project '[^']*' not found|"
+    r"has not been used in project",
+    re.IGNORECASE
+)
+
+# Whether Earth Engine has already been initialized in this process.
+_EE_INITIALIZED = False
+
+def get_credentials():
+    """
+    Returns the credentials Earth Engine is initialized with: the service account key if configured, or the
+    cached user credentials.
+
+    Their scopes include Cloud Storage, so they can also download the files exported by Earth Engine tasks.
+
+    Returns:
+        google.auth.credentials.Credentials: The credentials (ee.EEException is raised if there are none).
+    """
+    if SERVICE_ACCOUNT_JSON:
+        return ee.ServiceAccountCredentials(None, key_file=SERVICE_ACCOUNT_JSON)
+    return ee.data.get_persistent_credentials()
+
+def _initialize(project_name):
+    """
+    Initializes Earth Engine with the service account key if configured, or with the cached user credentials.
+
+    If EE_HIGH_VOLUME is enabled, the high-volume endpoint is used instead of the default (interactive) one.
+
+    Args:
+        project_name (str): The name of the Google Earth Engine project.
+
+    Returns:
+        None
+    """
+    url = HIGH_VOLUME_URL if EE_HIGH_VOLUME else None
+    if SERVICE_ACCOUNT_JSON:
+        ee.Initialize(get_credentials(), url=url, project=project_name)
+    else:
+        ee.Initialize(url=url, project=project_name)
+
+def _authenticate():
+    """
+    Obtains user credentials for Earth Engine when no service account key is configured.
+
+    With force=False the token cached in ~/.config/earthengine/credentials is reused while it is
+    still valid, so the browser flow only runs when there is no usable token.
+
+    Returns:
+        None
+    """
+    if not SERVICE_ACCOUNT_JSON:
+        ee.Authenticate(auth_mode="localhost", force=False)
+
+def authenticate_earth_engine(force=False):
     """
     Authenticates and initializes the Google Earth Engine service.
 
-    This function calls ee.Authenticate() followed by ee.Initialize() using the specified project name.
-    If an exception occurs during the process, it retries the authentication procedure.
+    This function first tries ee.Initialize() with the cached credentials (or the service account key set in
+    SERVICE_ACCOUNT_JSON) for the specified project name. Only if that fails does it run the ee.Authenticate()
+    flow and initialize again, so the common case avoids the interactive OAuth round-trip. Once initialized, subsequent calls return immediately.
+
+    Args:
+        force (bool): If True, initializes again even if it was already done in this process.
 
     Returns:
         None
     """
+    global _EE_INITIALIZED
+    if _EE_INITIALIZED and not force:
+        return
+
     try:
-        ee.Authenticate()
-        ee.Initialize(project=USER_PROJECT)
+        _initialize(USER_PROJECT)
     except Exception as e:
-        print(f"Error authenticating with Google Earth Engine: {e}")
+        print(f"Error initializing Google Earth Engine: {e}")
         print("Authenticating Google Earth Engine...")
-        ee.Authenticate()
-        ee.Initialize(project=USER_PROJECT)
+        _authenticate()
+        _initialize(USER_PROJECT)
+    _EE_INITIALIZED = True
+
+def _is_unrecoverable(error):
+    """
+    Checks whether an Earth Engine error cannot be fixed by simply retrying.
+
+    Args:
+        error (Exception): The exception raised while connecting to Earth Engine.
+
+    Returns:
+        bool: True for permission or project errors, False for transient failures.
+    """
+    if not isinstance(error, ee.EEException):
+        return False
+    return UNRECOVERABLE_ERROR.search(str(error)) is not None
 
-def reconnect_gee(project_name=USER_PROJECT, max_retries=5, delay=5):
+def reconnect_gee(project_name=USER_PROJECT, max_retries=5, delay=5, max_delay=30, jitter=0.5):
     """
     Attempts to re-authenticate and re-initialize the connection to Google Earth Engine.
 
     This function is useful when the connection has been lost or the token has expired.
-    It will try to reconnect up to 'max_retries' times, waiting 'delay' seconds between each attempt.
+    It will try to reconnect up to 'max_retries' times using exponential backoff with jitter
+    between attempts, so transient failures recover quickly without hammering EE during outages.
+    Unrecoverable errors (e.g., missing permissions) stop the retries immediately.
 
     Args:
         project_name (str): The name of the Google Earth Engine project.
         max_retries (int): Maximum number of reconnection attempts.
-        delay (int): Number of seconds to wait between attempts.
+        delay (float): Base number of seconds to wait after the first failed attempt.
+        max_delay (float): Upper bound (in seconds) for the wait between attempts.
+        jitter (float): Maximum random fraction added to each wait to spread out retries.
 
     Returns:
         bool: True if the connection was successfully re-established, False otherwise.
     """
+    global _EE_INITIALIZED
     for i in range(max_retries):
         try:
-            ee.Authenticate()
-            ee.Initialize(project=project_name)
+            try:
+                _initialize(project_name)
+            except ee.EEException:
+                # Cached credentials are no longer valid, so refresh them before retrying.
+                _authenticate()
+                _initialize(project_name)
+            _EE_INITIALIZED = True
             print("Connection to EE re-established.")
             return True
         except Exception as e:
             print(f"Error reconnecting to EE: {e} (Attempt {i+1}/{max_retries}).")
-            time.sleep(delay)
+            if _is_unrecoverable(e):
+                print("Unrecoverable error, giving up on reconnection.")
+                return False
+            sleep_s = min(max_delay, delay * (2 ** i) * (1 + random.random() * jitter))
+            time.sleep(sleep_s)
     return False
\ No newline at end of file
@@ -7,25 +7,46 @@ This module defines global configuration variables such as:
   - Pre-defined extraction locations and spectral indices
   - Dataset start and end dates
 
-It also performs authentication with Google Earth Engine (EE).
+Earth Engine geometries are built lazily (see get_aoi and get_gallocanta_aoi), so authentication with
+Google Earth Engine (EE) only happens when an EE object is first needed.
 """
 
 import ee
 from auth import authenticate_earth_engine
 import datetime
-
-# Authenticate Google Earth Engine (if not already authenticated)
-authenticate_earth_engine()
+import functools
 
 # Coordinates for Zaragoza (used for centering maps, etc.)
 ZARAGOZA_COORDS = [41.6488, -0.8891]
 
-# Area of interest (AOI) in Zaragoza
-AOI = ee.Geometry.Rectangle([-0.9500, 41.5800, -0.8300, 41.7200])
+# Bounding boxes (xmin, ymin, xmax, ymax) of the areas of interest, usable without any Earth Engine request.
+AOI_BBOX = (-0.9500, 41.5800, -0.8300, 41.7200)
+GALLOCANTA_AOI_BBOX = (-2.156, 40.474, -0.846, 41.464)
+
+@functools.lru_cache(maxsize=1)
+def get_aoi():
+    """
+    Returns the area of interest (AOI) in Zaragoza, authenticating with Earth Engine on first use.
+
+    Returns:
+        ee.Geometry: Rectangle covering the Zaragoza AOI.
+    """
+    authenticate_earth_engine()
+    return ee.Geometry.Rectangle(list(AOI_BBOX))
+
+@functools.lru_cache(maxsize=1)
+def get_gallocanta_aoi():
+    """
+    Returns the area of interest (AOI) in Gallocanta, authenticating with Earth Engine on first use.
+
+    This rectangle is defined to cover a larger area (roughly 110km x 110km) centered around Gallocanta.
+
+    Returns:
+        ee.Geometry: Rectangle covering the Gallocanta AOI.
+    """
+    authenticate_earth_engine()
+    return ee.Geometry.Rectangle(list(GALLOCANTA_AOI_BBOX))
 
-# Area of interest (AOI) in Gallocanta
-# This rectangle is defined to cover a larger area (roughly 110km x 110km) centered around Gallocanta.
-GALLOCANTA_AOI = ee.Geometry.Rectangle([-2.156, 40.474, -0.846, 41.464])
 # Exact geographic location of Gallocanta (longitude, latitude)
 GALLOCANTA_LOCATION = (-1.501846, 40.971332)
 
@@ -1,214 +1,476 @@
 import imageio
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
+import os
+import random
+import threading
 import time
+from functools import lru_cache
 
 from auth import reconnect_gee
 from config import GALLOCANTA_LOCATION
 
-def create_colorbar(width, height, ramp, font=None):
+# Optional GIF optimizer: only used if pygifsicle (and the gifsicle binary) are installed.
+try:
+    from pygifsicle import gifsicle
+except ImportError:
+    gifsicle = None
+
+# Shared HTTP session so thumbnail downloads reuse pooled connections instead of a new TLS handshake per frame.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+
+# HTTP status codes worth retrying when downloading thumbnails (throttling and server errors).
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# Re-authentication is shared by all download threads: one reconnect covers every URL that failed with a 401.
+_auth_lock = threading.Lock()
+_last_reauth_ts = 0.0
+_last_reauth_ok = False
+REAUTH_COOLDOWN = 60  # Seconds during which the result of a recent reconnect (or failure) is reused.
+
+# Maximum number of thumbnails downloaded concurrently (kept low to respect Earth Engine quotas).
+MAX_DOWNLOAD_WORKERS = 8
+
+# Legend ramps (value, color_hex) for the GIF layers.
+NDMI_RAMP = (
+    (-0.8, '#800000'),  # Dark red (low moisture)
+    (-0.24, '#ff0000'),  # Bright red (dry area)
+    (-0.032, '#ffff00'),  # Yellow (transition moisture)
+    (0.032, '#00ffff'),  # Cyan (moderate moisture)
+    (0.24, '#0000ff'),  # Bright blue (high moisture)
+    (0.8, '#000080')  # Dark blue (maximum moisture)
+)
+ERA5_RAMP = (
+    (0.0, '#ffffcc'),
+    (0.2, '#c2e699'),
+    (0.4, '#78c679'),
+    (0.6, '#31a354'),
+    (0.8, '#006837'),
+) # Green colors for ERA5 satellite frames
+
+def _load_font(size):
+    """
+    Loads the bold Arial font at the given size, falling back to PIL's default font if it is not available.
+
+    Args:
+        size (int): Font size.
+
+    Returns:
+        PIL.ImageFont: The loaded font.
+    """
+    try:
+        return ImageFont.truetype("arialbd.ttf", size)
+    except IOError:
+        return ImageFont.load_default()
+
+# Fonts resolved once at import time and shared by all drawing functions.
+FONT_LEGEND = _load_font(4)
+FONT_BAR = _load_font(15)
+FONT_DATE = _load_font(20)
+FONT_MARKER = _load_font(12)
+
+@lru_cache(maxsize=128)
+def _text_bbox(text, font):
+    """
+    Returns the bounding box of a text rendered with the given font, cached per (text, font).
+
+    Equivalent to draw.textbbox((0, 0), text, font=font), but labels repeated on every frame are only measured once.
+
+    Args:
+        text (str): Text to measure.
+        font (PIL.ImageFont): Font used to render the text.
+
+    Returns:
+        tuple: (left, top, right, bottom) of the text box in pixels.
+    """
+    return font.getbbox(text)
+
+def _hex_to_rgb(hexcolor):
+    """
+    Converts a '#rrggbb' color string into an (R, G, B) tuple.
+
+    Args:
+        hexcolor (str): Color in hexadecimal notation.
+
+    Returns:
+        tuple: (R, G, B) integers between 0 and 255.
+    """
+    return tuple(int(hexcolor[i:i+2], 16) for i in (1, 3, 5))
+
+# Ramps pre-parsed once at import time as (value, (R, G, B)) tuples.
+NDMI_RAMP_RGB = tuple((val, _hex_to_rgb(hexcolor)) for val, hexcolor in NDMI_RAMP)
+ERA5_RAMP_RGB = tuple((val, _hex_to_rgb(hexcolor)) for val, hexcolor in ERA5_RAMP)
+
+@lru_cache(maxsize=8)
+def create_colorbar(width, height, ramp_rgb, font=FONT_LEGEND):
     """
     Generates a PIL image containing a vertical gradient based on the provided ramp.
 
-    The ramp is a list of tuples (value, color_hex) that defines breakpoints for the gradient.
+    The ramp is a tuple of (value, (R, G, B)) tuples that defines breakpoints for the gradient.
     The generated image also includes labels drawn to the right side.
 
+    Results are memoized per (width, height, ramp, font) so repeated GIFs with the same palette reuse the
+    same image. The returned image is shared between callers and must not be modified in place.
+
     Args:
         width (int): The width (in pixels) for the gradient area.
         height (int): The height (in pixels) for the gradient.
-        ramp (list of tuples): List of (value, color_hex) breakpoints, e.g., [(-0.8, '#800000'), ...].
-        font (PIL.ImageFont, optional): Font used to draw the labels. If None, a default bold font (arialbd.ttf)
-                                        is attempted with size 4.
+        ramp_rgb (tuple of tuples): Pre-parsed (value, (R, G, B)) breakpoints, e.g., NDMI_RAMP_RGB.
+        font (PIL.ImageFont): Font used to draw the labels (one of the module-level fonts).
 
     Returns:
         PIL.Image: An RGBA image of the colorbar with labels.
     """
     colorbar = Image.new('RGBA', (width * 3 + 8, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(colorbar)
 
-    min_val, _ = ramp[0]
-    max_val, _ = ramp[-1]
+    min_val, _ = ramp_rgb[0]
+    max_val, _ = ramp_rgb[-1]
     val_range = max_val - min_val
 
-    def interpolate_color(c1, c2, t):
-        """
-        Linearly interpolates between two colors.
+    # Convert the ramp into arrays of breakpoint values and RGB colors.
+    vals = np.array([val for val, _ in ramp_rgb], dtype=np.float32)
+    colors = np.array([rgb for _, rgb in ramp_rgb], dtype=np.float32)
 
-        Args:
-            c1 (tuple): First color as (R, G, B).
-            c2 (tuple): Second color as (R, G, B).
-            t (float): Interpolation parameter between 0 and 1.
+    # Build a 256-entry RGB lookup table over the ramp range, then index it for every row of the gradient.
+    ts = np.linspace(min_val, max_val, 256)
+    lut = np.stack([np.interp(ts, vals, colors[:, c]) for c in range(3)], axis=1).astype(np.uint8)
+    rgb = lut[np.rint(np.linspace(0, 255, height)).astype(np.int32)]
 
-        Returns:
-            tuple: Interpolated color as (R, G, B).
-        """
-        return (
-            int(c1[0] + (c2[0] - c1[0]) * t),
-            int(c1[1] + (c2[1] - c1[1]) * t),
-            int(c1[2] + (c2[2] - c1[2]) * t)
-        )
-
-    # Convert hex colors to RGB and store in ramp_rgb.
-    ramp_rgb = []
-    for val, hexcolor in ramp:
-        rgb = tuple(int(hexcolor[i:i+2], 16) for i in (1, 3, 5))
-        ramp_rgb.append((rgb, val))
-
-    # Create the vertical gradient.
-    for row in range(height):
-        frac = row / float(height - 1)
-        current_val = min_val + frac * val_range
-
-        color_row = (0, 0, 0)
-        for i in range(len(ramp_rgb) - 1):
-            val_i = ramp_rgb[i][1]
-            val_ip1 = ramp_rgb[i+1][1]
-            if val_i <= current_val <= val_ip1:
-                local_frac = (current_val - val_i) / (val_ip1 - val_i)
-                c1 = ramp_rgb[i][0]
-                c2 = ramp_rgb[i+1][0]
-                color_row = interpolate_color(c1, c2, local_frac)
-                break
-        else:
-            # If out of range, use the extreme color.
-            if current_val < ramp_rgb[0][1]:
-                color_row = ramp_rgb[0][0]
-            elif current_val > ramp_rgb[-1][1]:
-                color_row = ramp_rgb[-1][0]
-
-        # Fill the current row of the gradient.
-        for col in range(width):
-            colorbar.putpixel((col, height - 1 - row), color_row)
-
-    # Set up the font if not provided.
-    if not font:
-        try:
-            font = ImageFont.truetype("arialbd.ttf", 4)
-        except IOError:
-            font = ImageFont.load_default()
+    # Broadcast the rows across the gradient width, flipped so the minimum value is at the bottom.
+    gradient = np.empty((height, width, 4), dtype=np.uint8)
+    gradient[..., :3] = rgb[::-1, None, :].astype(np.uint8)
+    gradient[..., 3] = 255
+    colorbar.paste(Image.fromarray(gradient), (0, 0))
+    draw = ImageDraw.Draw(colorbar)
 
-    # Draw labels to the right of the gradient.
+    # Compute every label row and vertical offset at once, then draw the labels to the right of the gradient.
     text_x = width + 5
-    for val, hexcolor in ramp:
-        frac_label = (val - min_val) / val_range
-        label_row = height - int(frac_label * (height - 1))
-        label_str = f"{val:g}"
-
-        # Apply a dynamic vertical offset based on the value.
-        if -0.5 < val < 0 or val > 0.5:
-            y_offset = 1   # Move down
-        elif 0.5 > val > 0:
-            y_offset = -10 # Move up
-        elif val < -0.5:
-            y_offset = -15 # Move up
-        else:
-            y_offset = 0   # For zero, centered
-
-        # Draw the text applying the offset
-        draw.text((text_x, label_row + y_offset), label_str, fill="black", font=font)
+    vals = np.array([val for val, _ in ramp_rgb])
+    label_rows = height - ((vals - min_val) / val_range * (height - 1)).astype(int)
+    # Dynamic vertical offset based on the value: down for slightly negative/high values, up for small positive
+    # and very negative values, centered for zero.
+    y_offsets = np.select(
+        [((vals > -0.5) & (vals < 0)) | (vals > 0.5), (vals > 0) & (vals < 0.5), vals < -0.5],
+        [1, -10, -15],
+        default=0
+    )
+    for (val, _), label_row, y_offset in zip(ramp_rgb, label_rows, y_offsets):
+        draw.text((text_x, int(label_row + y_offset)), f"{val:g}", fill="black", font=font)
 
     return colorbar
 
-def draw_marker(draw, point, aoi_info, image_size, marker_color="red", marker_radius=5, text="Localidad"):
+@lru_cache(maxsize=16)
+def _aoi_info(aoi):
     """
-    Draws a marker (a circle) on an image at a given geographic location and places a label above it.
+    Returns the client-side description of an AOI, fetching it from Earth Engine only once per geometry.
 
-    This function converts geographic coordinates into pixel coordinates using the AOI's boundary.
+    Args:
+        aoi (ee.Geometry): Area of interest (EE geometries are hashable by value).
+
+    Returns:
+        dict: The result of aoi.getInfo().
+    """
+    return aoi.getInfo()
+
+def compute_aoi_bbox(aoi_info):
+    """
+    Computes the bounding box of an AOI from its client-side description.
 
     Args:
-        draw (PIL.ImageDraw): Drawing context.
-        point (tuple): (longitude, latitude) for the marker.
         aoi_info (dict): AOI information from ee.Geometry.getInfo().
-        image_size (tuple): (width, height) of the image in pixels.
-        marker_color (str): Color of the marker.
-        marker_radius (int): Radius (in pixels) of the marker circle.
-        text (str): Text label to display above the marker.
+
+    Returns:
+        tuple: (xmin, ymin, xmax, ymax) in geographic coordinates.
     """
-    # Extract polygon coordinates from the AOI info.
-    coords = aoi_info["coordinates"][0]
-    lons = [c[0] for c in coords]
-    lats = [c[1] for c in coords]
-    xmin, xmax = min(lons), max(lons)
-    ymin, ymax = min(lats), max(lats)
+    coords = np.asarray(aoi_info["coordinates"][0], dtype=float)
+    xmin, ymin = coords.min(axis=0)
+    xmax, ymax = coords.max(axis=0)
+    return float(xmin), float(ymin), float(xmax), float(ymax)
 
+def draw_marker(draw, points, bbox, image_size, marker_color="red", marker_radius=5, text="Localidad",
+                font=FONT_MARKER):
+    """
+    Draws markers (circles) on an image at the given geographic locations and places a label above each one.
+
+    Geographic coordinates of all markers are converted into pixel coordinates in a single NumPy pass
+    using the AOI bounding box.
+
+    Args:
+        draw (PIL.ImageDraw): Drawing context.
+        points (array-like): (longitude, latitude) of one marker, or an (N, 2) array of them.
+        bbox (tuple): AOI bounding box (xmin, ymin, xmax, ymax), as returned by compute_aoi_bbox.
+        image_size (tuple): (width, height) of the image in pixels.
+        marker_color (str): Color of the markers.
+        marker_radius (int): Radius (in pixels) of the marker circles.
+        text (str or list of str): Label to display above the markers, or one label per marker.
+        font (PIL.ImageFont): Font for the labels.
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    labels = [text] * len(points) if isinstance(text, str) else text
+    xmin, ymin, xmax, ymax = bbox
     width_px, height_px = image_size
-    lon, lat = point
-    # Convert geographic coordinate to pixel coordinate.
-    x_pixel = (lon - xmin) / (xmax - xmin) * width_px
-    y_pixel = (ymax - lat) / (ymax - ymin) * height_px
-
-    # Draw the circular marker.
-    draw.ellipse(
-        [(x_pixel - marker_radius, y_pixel - marker_radius),
-         (x_pixel + marker_radius, y_pixel + marker_radius)],
-        fill=marker_color
-    )
 
-    # Load the font for the marker label.
-    try:
-        font = ImageFont.truetype("arialbd.ttf", 12)
-    except IOError:
-        font = ImageFont.load_default()
+    # Convert geographic coordinates to pixel coordinates.
+    xs = (points[:, 0] - xmin) / (xmax - xmin) * width_px
+    ys = (ymax - points[:, 1]) / (ymax - ymin) * height_px
 
-    # Calculate text width for horizontal centering.
-    bbox = draw.textbbox((0, 0), text, font=font)
-    text_width = bbox[2] - bbox[0]
+    for x_pixel, y_pixel, label in zip(xs, ys, labels):
+        # Draw the circular marker.
+        draw.ellipse(
+            [(x_pixel - marker_radius, y_pixel - marker_radius),
+             (x_pixel + marker_radius, y_pixel + marker_radius)],
+            fill=marker_color
+        )
 
-    # Determine label position above the marker.
-    # Centered horizontally and, vertically placed 5 pixels above the marker
-    x_text = x_pixel - text_width / 2
-    y_text = y_pixel - marker_radius - 5 - (bbox[3] - bbox[1])
-    draw.text((x_text, y_text), text, fill=marker_color, font=font)
+        # Calculate text width for horizontal centering.
+        bbox_text = _text_bbox(label, font)
+        text_width = bbox_text[2] - bbox_text[0]
 
-def download_thumbnail(url, timeout=60, check_interval=0.5):
+        # Determine label position above the marker.
+        # Centered horizontally and, vertically placed 5 pixels above the marker
+        x_text = x_pixel - text_width / 2
+        y_text = y_pixel - marker_radius - 5 - (bbox_text[3] - bbox_text[1])
+        draw.text((x_text, y_text), label, fill=marker_color, font=font)
+
+def get_thumbnail_urls(images, params, max_workers=MAX_DOWNLOAD_WORKERS):
     """
-    Attempts to download the image from the specified URL, waiting until the image is available.
+    Requests the thumbnail URL of each image concurrently, preserving the input order.
 
-    If a 401 error is detected, it attempts to re-authenticate and reconnect to Earth Engine.
+    Args:
+        images (list of ee.Image): Images to get the thumbnail URLs for.
+        params (dict): Thumbnail parameters passed to getThumbURL (min, max, palette, region, dimensions...).
+        max_workers (int): Number of concurrent Earth Engine requests.
+
+    Returns:
+        list of str: Thumbnail URL of each image.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda img: img.getThumbURL(params), images))
+
+def _reauthenticate():
+    """
+    Reconnects to Earth Engine after a 401, once for all threads.
+
+    Threads that hit a 401 while another one is reconnecting wait for it and reuse its result, successful or
+    not, instead of starting their own reconnection (with its own retries).
+
+    Returns:
+        bool: True if the connection is (or was recently) re-established, False if the last attempt failed.
+    """
+    global _last_reauth_ts, _last_reauth_ok
+    with _auth_lock:
+        if time.time() - _last_reauth_ts < REAUTH_COOLDOWN:
+            return _last_reauth_ok
+        _last_reauth_ok = reconnect_gee()
+        _last_reauth_ts = time.time()
+        return _last_reauth_ok
+
+def download_thumbnail(url, max_retries=6, timeout=(5, 30), base_delay=0.5, max_delay=30, session=SESSION):
+    """
+    Attempts to download the image from the specified URL, retrying with exponential backoff and jitter.
+
+    Only retryable failures (HTTP 429/5xx and connection errors) are retried. If a 401 error is detected,
+    it attempts once to re-authenticate and reconnect to Earth Engine. Other 4xx errors fail immediately.
 
     Args:
         url (str): URL of the image.
-        timeout (float): Maximum time in seconds to wait for a successful download.
-        check_interval (float): Seconds to wait between successive attempts.
+        max_retries (int): Maximum number of download attempts.
+        timeout (float or tuple): Timeout in seconds for each HTTP request, or a (connect, read) pair.
+        base_delay (float): Seconds to wait after the first failed attempt; doubled on each retry.
+        max_delay (float): Upper bound (in seconds) for the wait between attempts.
+        session (requests.Session): HTTP session used for the requests (pooled connections).
 
     Returns:
-        requests.Response: The HTTP response if the image is successfully downloaded, or None on timeout.
+        requests.Response: The HTTP response if the image is successfully downloaded, or None otherwise.
     """
-    start_time = time.time()
     reconnect_done = False
-    while True:
+    for attempt in range(max_retries):
         try:
-            response = requests.get(url)
+            response = session.get(url, timeout=timeout)
             if response.status_code == 200:
                 return response
             elif response.status_code == 401 and not reconnect_done:
                 print(f"\nError 401 detected at {url}. Attempting to re-authenticate and reconnect to EE...")
-                if reconnect_gee():
-                    reconnect_done = True
-                else:
+                reconnect_done = True
+                if not _reauthenticate():
                     print("Failed to reconnect to EE.")
-            else:
+                    return None
+                continue  # Retry right away with the new credentials.
+            elif response.status_code not in RETRYABLE_STATUS:
                 print(f"\nError downloading image from: {url} (Status code: {response.status_code})")
-
-            # Check the timeout
-            if time.time() - start_time > timeout:
-                print(f"\nTimeout reached while downloading image from: {url}")
                 return None
-            time.sleep(check_interval)
-        except Exception as e:
+            print(f"\nRetryable error downloading image from: {url} (Status code: {response.status_code})")
+        except requests.exceptions.RequestException as e:
             print(f"\nException while trying to download {url}: {e}")
-            if time.time() - start_time > timeout:
-                print(f"\nTimeout reached (exception) while downloading {url}")
-                return None
-            time.sleep(check_interval)
 
-def create_gif_from_urls(urls, dates, legend_palette, aoi, output_filename='laguna_gallocanta_evolucion.gif', duration=1):
+        sleep_s = min(max_delay, base_delay * (2 ** attempt) * (1 + random.random() * 0.5))
+        time.sleep(sleep_s)
+
+    print(f"\nMaximum retries reached while downloading image from: {url}")
+    return None
+
+def _annotate_frame(content, date_text, aoi_bbox, legend_img, legend_mask):
+    """
+    Annotates one downloaded frame with its date label, the colorbar legend and the geographic marker.
+
+    Args:
+        content (bytes): Raw image bytes of the frame.
+        date_text (str): Label to draw in the bottom-right corner.
+        aoi_bbox (tuple): AOI bounding box (xmin, ymin, xmax, ymax).
+        legend_img (PIL.Image): Colorbar legend, shared by every frame and not modified.
+        legend_mask (PIL.Image): Alpha channel of the legend, used as the paste mask.
+
+    Returns:
+        numpy.ndarray: The annotated frame.
+    """
+    font = FONT_DATE
+
+    # Decode the image straight into PIL (RGBA so the legend can be alpha-composited).
+    pil_img = Image.open(BytesIO(content)).convert('RGBA')
+    draw = ImageDraw.Draw(pil_img)
+
+    # Calculate text size and position in the bottom-right corner.
+    text = date_text
+    bbox = _text_bbox(text, font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    width, height = pil_img.size
+    x_date = width - text_width - 5  # 5 pixels from right border
+    y_date = height - text_height - 5  # 5 pixels from bottom border
+    draw.text((x_date, y_date), text, fill="black", font=font)
+
+    # Paste the colorbar legend in the top-right corner.
+    # Make sure the bar is not bigger than the frame
+    x_bar = width - legend_img.width - 5
+    y_bar = 5
+    pil_img.paste(legend_img, (x_bar, y_bar), legend_mask)
+
+    # Draw the geographic marker with label.
+    draw_marker(draw, GALLOCANTA_LOCATION, aoi_bbox, pil_img.size, marker_color="black", marker_radius=3,
+                text="Laguna de Gallocanta", font=FONT_MARKER)
+
+    # Expose the annotated image as a NumPy array without an extra copy of PIL's buffer.
+    return np.asarray(pil_img)
+
+def _fetch_frame(url, date_text, aoi_bbox, legend_img, legend_mask):
+    """
+    Downloads one thumbnail and annotates it, inside a download thread.
+
+    Args:
+        url (str): URL of the image.
+        date_text (str): Label to draw on the frame.
+        aoi_bbox (tuple): AOI bounding box (xmin, ymin, xmax, ymax).
+        legend_img (PIL.Image): Colorbar legend.
+        legend_mask (PIL.Image): Alpha channel of the legend.
+
+    Returns:
+        numpy.ndarray: The annotated frame, or None if the download failed.
+    """
+    response = download_thumbnail(url)
+    if response is None:
+        return None
+    return _annotate_frame(response.content, date_text, aoi_bbox, legend_img, legend_mask)
+
+class _GifWriter:
+    """
+    Writes an animated GIF one frame at a time, so only the frame being encoded is held in memory.
+
+    imageio's GIF writer (and Pillow's save_all) keep every appended frame until the file is closed. Here each
+    frame is encoded by Pillow as a single-frame GIF, with its own palette and transparency, and its blocks are
+    appended to the output file right away: the first frame's color table becomes the global one and the
+    following frames carry theirs as a local color table. Frames are stored whole (no delta frames); gifsicle
+    optimizes them afterwards if it is installed (see optimize_gif).
+
+    Args:
+        path (str): File path of the output GIF.
+        duration (float): Frame duration, passed to Pillow as is (as imageio did).
+    """
+
+    def __init__(self, path, duration):
+        self._file = open(path, "wb")
+        self._duration = duration
+        self._first = True
+
+    def append_data(self, frame):
+        """
+        Encodes a frame and appends it to the GIF.
+
+        Args:
+            frame (numpy.ndarray): The frame, as an (H, W, 3) or (H, W, 4) uint8 array.
+        """
+        buffer = BytesIO()
+        Image.fromarray(frame).save(buffer, format="GIF", duration=self._duration, disposal=2)
+        data = buffer.getvalue()
+
+        # Header (6 bytes), logical screen descriptor (7 bytes) and global color table, if any.
+        flags = data[10]
+        table = data[13:13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)]
+        blocks = data[13 + len(table):-1]  # Without the trailer
+
+        if self._first:
+            # Force GIF89a, as later frames may carry graphic control extensions.
+            self._file.write(b"GIF89a" + data[6:13] + table + blocks)
+            self._first = False
+            return
+
+        # Skip the extensions before the image descriptor, then move the color table into the descriptor.
+        i = 0
+        while blocks[i] == 0x21:
+            i += 2
+            while blocks[i]:
+                i += blocks[i] + 1
+            i += 1
+        descriptor = bytearray(blocks[i:i + 10])
+        if table:
+            descriptor[9] |= 0x80 | (flags & 7)
+        self._file.write(blocks[:i] + descriptor + table + blocks[i + 10:])
+
+    def close(self):
+        """Writes the GIF trailer and closes the file."""
+        self._file.write(b";")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def optimize_gif(path):
+    """
+    Optimizes a GIF in place with gifsicle (-O3), if it is available.
+
+    Args:
+        path (str): File path of the GIF to optimize.
+
+    Returns:
+        bool: True if the GIF was optimized, False if gifsicle is not installed.
+    """
+    if gifsicle is None:
+        return False
+    try:
+        gifsicle(sources=path, options=["-O3"])
+    except FileNotFoundError:
+        print("gifsicle not found, skipping GIF optimization.")
+        return False
+    return True
+
+def create_gif_from_urls(urls, dates, legend_palette, aoi, output_filename='laguna_gallocanta_evolucion.gif', duration=1,
+                         bbox=None, max_workers=MAX_DOWNLOAD_WORKERS):
     """
     Downloads images from a list of URLs, annotates each image with a date label, pastes a static colorbar legend,
     draws a geographic marker, and creates an animated GIF.
 
+    Each frame is downloaded and annotated in a thread pool; decoding and drawing a 512px thumbnail takes a few
+    milliseconds, much less than its download. Frames are written to the GIF in their original order as soon as
+    they are ready, while the rest are still downloading, and at most 2 * max_workers frames are in memory.
+
     Args:
         urls (list of str): List of image URLs.
         dates (list of str): List of corresponding date strings for each image.
@@ -216,93 +478,59 @@ def create_gif_from_urls(urls, dates, legend_palette, aoi, output_filename='lagu
         aoi (ee.Geometry): Area of interest; its .getInfo() is used to determine pixel mappings.
         output_filename (str): Filename for the output GIF.
         duration (float): Time (in seconds) each frame is displayed in the GIF.
+        bbox (tuple, optional): AOI bounding box (xmin, ymin, xmax, ymax). If given, aoi.getInfo() is skipped.
+        max_workers (int): Number of concurrent thumbnail downloads.
     """
-    if legend_palette == "ndmi":
-        legend_items = [
-            (-0.8, '#800000'),  # Dark red (low moisture)
-            (-0.24, '#ff0000'),  # Bright red (dry area)
-            (-0.032, '#ffff00'),  # Yellow (transition moisture)
-            (0.032, '#00ffff'),  # Cyan (moderate moisture)
-            (0.24, '#0000ff'),  # Bright blue (high moisture)
-            (0.8, '#000080')  # Dark blue (maximum moisture)
-        ]
-    else:
-        legend_items = [
-            (0.0, '#ffffcc'),
-            (0.2, '#c2e699'),
-            (0.4, '#78c679'),
-            (0.6, '#31a354'),
-            (0.8, '#006837'),
-        ] # Green colors for ERA5 satellite frames
-
-    images = []
-    counter = 0
+    ramp_rgb = NDMI_RAMP_RGB if legend_palette == "ndmi" else ERA5_RAMP_RGB
+
     total = len(urls)
 
-    # Generate the continuous colorbar legend once.
+    # Generate the continuous colorbar legend once. Its alpha channel is fixed, so extract it once and reuse it as
+    # the paste mask for every frame.
     colorbar_width = 20
     colorbar_height = 100
 
-    try:
-        font_bar = ImageFont.truetype("arialbd.ttf", 15)
-    except IOError:
-        font_bar = ImageFont.load_default()
-
-    legend_img = create_colorbar(colorbar_width, colorbar_height, legend_items, font=font_bar)
-
-    marker_point = GALLOCANTA_LOCATION
-    aoi_info = aoi.getInfo()
-
-    for url, date_text in zip(urls, dates):
-        response = download_thumbnail(url, timeout=20)
-        if response is not None:
-            # Read image from binary data.
-            img_array = imageio.v2.imread(BytesIO(response.content))
-            pil_img = Image.fromarray(img_array)
-            draw = ImageDraw.Draw(pil_img)
-
-            try:
-                font = ImageFont.truetype("arialbd.ttf", 20)
-            except IOError:
-                font = ImageFont.load_default()
-
-            # Calculate text size and position in the bottom-right corner.
-            text = date_text
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            width, height = pil_img.size
-            x_date = width - text_width - 5  # 5 pixels from right border
-            y_date = height - text_height - 5  # 5 pixels from bottom border
-            draw.text((x_date, y_date), text, fill="black", font=font)
-
-            # Paste the colorbar legend in the top-right corner.
-            # Make sure the bar is not bigger than the frame
-            x_bar = width - legend_img.width - 5
-            y_bar = 5
-            pil_img.paste(legend_img, (x_bar, y_bar), legend_img)
-
-            # Draw the geographic marker with label.
-            draw_marker(draw, marker_point, aoi_info, pil_img.size, marker_color="black", marker_radius=3, text="Laguna de Gallocanta")
-
-            # Convert annotated image to NumPy array and append to frames list.
-            annotated_array = np.array(pil_img)
-            images.append(annotated_array)
-        else:
-            print(f"Final error downloading the frame from: {url}")
-        counter += 1
-
-        # Update progress on the same line.
-        progress = counter / total
-        bar_length = 50 # Total length of the bar
-        filled_length = int(bar_length * progress)
-        bar = "█" * filled_length + "-" * (bar_length - filled_length)
-        print(f"\rProgress: [{bar}] {progress*100:6.2f}%", end="", flush=True)
+    legend_img = create_colorbar(colorbar_width, colorbar_height, ramp_rgb, font=FONT_BAR)
+    legend_mask = legend_img.getchannel('A')
+
+    aoi_bbox = bbox if bbox is not None else compute_aoi_bbox(_aoi_info(aoi))
+
+    # Frames are submitted in a sliding window of twice the number of download threads: enough to keep every
+    # thread busy, while at most that many downloaded or annotated frames are held in memory at any time.
+    pending = deque()
+    written = 0
+
+    with _GifWriter(output_filename, duration) as writer, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def write_next():
+            nonlocal written
+            url, future = pending.popleft()
+            frame = future.result()
+            if frame is None:
+                print(f"Final error downloading the frame from: {url}")
+                return
+            writer.append_data(frame)
+            written += 1
+
+            # Update progress on the same line.
+            progress = written / total
+            bar_length = 50 # Total length of the bar
+            filled_length = int(bar_length * progress)
+            bar = "█" * filled_length + "-" * (bar_length - filled_length)
+            print(f"\rProgress: [{bar}] {progress*100:6.2f}%", end="", flush=True)
+
+        # Write the annotated frames in their original order, waiting for the oldest one when the window is full.
+        for url, date_text in zip(urls, dates):
+            pending.append((url, executor.submit(_fetch_frame, url, date_text, aoi_bbox, legend_img, legend_mask)))
+            if len(pending) >= 2 * max_workers:
+                write_next()
+        while pending:
+            write_next()
+
+    optimize_gif(output_filename)
 
     print(f"\n")
-    # Create the animated GIF.
-    imageio.mimsave(output_filename, images, duration=duration)
-    print(f"GIF created and saved as {output_filename}")
+    print(f"GIF created and saved as {output_filename} ({written}/{total} frames)")
 
 def merge_gifs(gif_paths, output_path, duration=0.1):
     """
@@ -316,12 +544,14 @@ def merge_gifs(gif_paths, output_path, duration=0.1):
     Returns:
         None
     """
-    all_frames = []
-    for path in gif_paths:
-        try:
-            frames = imageio.mimread(path)
-            all_frames.extend(frames)
-        except Exception as e:
-            print(f"Error reading {path}: {e}")
-    imageio.mimsave(output_path, all_frames, duration=duration)
+    with _GifWriter(output_path, duration) as writer:
+        # Stream frames from each source GIF into the output, one frame at a time.
+        for path in gif_paths:
+            try:
+                with imageio.get_reader(path) as reader:
+                    for frame in reader:
+                        writer.append_data(frame)
+            except Exception as e:
+                print(f"Error reading {path}: {e}")
+    optimize_gif(output_path)
     print(f"Merged GIF saved at {output_path}")
\ No newline at end of file
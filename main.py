@@ -1,13 +1,14 @@
 from auth import authenticate_earth_engine
-from processing import process_image_collection, get_era5_collection
+from processing import process_image_collection, get_preview_composite, get_era5_collection
 from visualization import create_map, save_map, open_map
-from point_extraction import extract_point_values, extract_region_values
-from config import (ZARAGOZA_COORDS, AOI, GALLOCANTA_AOI, VIS_PARAMS, LOCATIONS,
+from point_extraction import extract_many_point_values, extract_many_region_values
+from config import (ZARAGOZA_COORDS, get_aoi, get_gallocanta_aoi, GALLOCANTA_AOI_BBOX, VIS_PARAMS, LOCATIONS,
                     INDICES, ERA5_BANDS, SENTINEL_START_DATE, ERA5_START_DATE)
-from time_series_extraction import get_weekly_image_collection, extract_time_series, save_to_csv, get_monthly_composites
+from time_series_extraction import (get_weekly_image_collection, extract_time_series, save_to_csv, get_monthly_composites,
+                                    export_time_series, EXPORT_BUCKET)
 from plot_time_series import plot_indices_per_point, plot_points_per_index
-from gif_gen import create_gif_from_urls, merge_gifs
-import ee
+from gif_gen import create_gif_from_urls, get_thumbnail_urls, merge_gifs
+from concurrent.futures import ThreadPoolExecutor
 
 def main_menu():
     """
@@ -34,16 +35,18 @@ def process_satellite_data():
     Returns:
         tuple: A tuple containing:
             - collection (ee.Image): Processed Sentinel-2 image collection.
-            - era5_coll (ee.Image): ERA5-Land collection for a specific period.
+            - era5_coll (ee.ImageCollection): ERA5-Land collection for a specific period.
             - image_collection (ee.ImageCollection): Weekly filtered Sentinel-2 images.
             - era5_collection (ee.ImageCollection): Sentinel ERA5-Land images starting from a defined date.
     """
     print("📡 Processing Sentinel-2 and ERA5-Land data...")
-    collection = process_image_collection(AOI)
-    era5_coll = get_era5_collection(AOI, start_date='2024-12-01', end_date='2024-12-31')
+    aoi = get_aoi()
+    collection = process_image_collection(aoi)
 
-    image_collection = get_weekly_image_collection(AOI, start_date=SENTINEL_START_DATE)
-    era5_collection = get_era5_collection(AOI, start_date=ERA5_START_DATE)
+    image_collection = get_weekly_image_collection(aoi, start_date=SENTINEL_START_DATE)
+    era5_collection = get_era5_collection(aoi, start_date=ERA5_START_DATE)
+    # Take the map period from the full ERA5-Land collection instead of building a second one.
+    era5_coll = era5_collection.filterDate('2024-12-01', '2024-12-31')
 
     return collection, era5_coll, image_collection, era5_collection
 
@@ -56,18 +59,57 @@ def extract_time_series_data(image_collection, era5_collection):
         era5_collection (ee.ImageCollection): ERA5-Land image collection.
 
     Returns:
-        None
+        bool: True if both CSV files were saved, so the time-series plots can be generated.
     """
     print("📊 Extracting time-series data...")
-    # Extract time-series data for Sentinel-2 using selected locations and indices.
-    sentinel_data = extract_time_series(image_collection, LOCATIONS, INDICES, scale=10, start_date=SENTINEL_START_DATE,
-                                        dataset_name="Sentinel-2", time_interval=14)
-    save_to_csv(sentinel_data, "sentinel_time_series.csv")
+    if EXPORT_BUCKET:
+        return export_time_series_data(image_collection, era5_collection)
+
+    # Both extractions are bound by Earth Engine round-trips, so run them concurrently. Each one is streamed
+    # to its CSV file as the batches arrive instead of being collected in memory first.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Extract time-series data for Sentinel-2 using selected locations and indices.
+        sentinel_rows = extract_time_series(image_collection, LOCATIONS, INDICES, scale=10,
+                                            start_date=SENTINEL_START_DATE, dataset_name="Sentinel-2",
+                                            time_interval=14)
+        sentinel_future = executor.submit(save_to_csv, sentinel_rows, "sentinel_time_series.csv")
+
+        # Extract time-series data for ERA5-Land using selected locations.
+        era5_rows = extract_time_series(era5_collection, LOCATIONS, ERA5_BANDS, scale=11132,
+                                        start_date=ERA5_START_DATE, dataset_name="ERA5-Land", time_interval=14)
+        era5_future = executor.submit(save_to_csv, era5_rows, "era5_time_series.csv")
+
+        sentinel_future.result()
+        era5_future.result()
+    return True
+
+def export_time_series_data(image_collection, era5_collection):
+    """
+    Exports the time-series data of both satellite collections to the Cloud Storage bucket in EE_EXPORT_BUCKET,
+    and downloads the exported files into the same CSV files as extract_time_series_data.
+
+    Args:
+        image_collection (ee.ImageCollection): Weekly Sentinel-2 image collection.
+        era5_collection (ee.ImageCollection): ERA5-Land image collection.
 
-    # Extract time-series data for ERA5-Land using selected locations.
-    era5_data = extract_time_series(era5_collection, LOCATIONS, ERA5_BANDS, scale=11132, start_date=ERA5_START_DATE,
-                                    dataset_name="ERA5-Land", time_interval=14)
-    save_to_csv(era5_data, "era5_time_series.csv")
+    Returns:
+        bool: True if both exports were downloaded and saved.
+    """
+    print(f"☁️ Exporting time-series data to gs://{EXPORT_BUCKET}...")
+    # Both export tasks run on Earth Engine, so start and wait for them concurrently.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        sentinel_future = executor.submit(export_time_series, image_collection, LOCATIONS, INDICES, scale=10,
+                                          start_date=SENTINEL_START_DATE, dataset_name="Sentinel-2",
+                                          time_interval=14, filename="sentinel_time_series.csv")
+        era5_future = executor.submit(export_time_series, era5_collection, LOCATIONS, ERA5_BANDS, scale=11132,
+                                      start_date=ERA5_START_DATE, dataset_name="ERA5-Land", time_interval=14,
+                                      filename="era5_time_series.csv")
+
+        results = [sentinel_future.result(), era5_future.result()]
+        for uris in results:
+            if uris:
+                print(f"✅ Exported to {', '.join(uris)}")
+    return all(uris is not None for uris in results)
 
 def generate_time_series_plots():
     """
@@ -77,9 +119,9 @@ def generate_time_series_plots():
         None
     """
     print("\nGenerating time-series plots...")
-    plot_indices_per_point("sentinel_time_series.csv")  # View all indices in each point
-    # plot_points_per_index("sentinel_time_series.csv")  # Uncomment to view each index across all points
-    plot_indices_per_point("era5_time_series.csv")
+    plot_indices_per_point("sentinel_time_series.csv", show=False)  # View all indices in each point
+    # plot_points_per_index("sentinel_time_series.csv", show=False)  # Uncomment to view each index across all points
+    plot_indices_per_point("era5_time_series.csv", show=False)
 
 def create_interactive_map(collection, era5_coll):
     """
@@ -87,15 +129,17 @@ def create_interactive_map(collection, era5_coll):
 
     Args:
         collection (ee.Image): Processed Sentinel-2 image collection.
-        era5_coll (ee.Image): Processed ERA5-Land image collection.
+        era5_coll (ee.ImageCollection): ERA5-Land image collection for the map period.
 
     Returns:
         None
     """
     print("🗺️ Creating and saving the map...")
 
-    # Create the map
-    m = create_map(ZARAGOZA_COORDS, collection, era5_coll, VIS_PARAMS)
+    # Create the map from a quality mosaic, which loads much faster than the median composite; the
+    # median is still used below for the extracted values.
+    preview = get_preview_composite(get_aoi())
+    m = create_map(ZARAGOZA_COORDS, preview, era5_coll, VIS_PARAMS)
     html_filename = "map.html"  # Default name
 
     # Save the map as an HTML file
@@ -107,13 +151,11 @@ def create_interactive_map(collection, era5_coll):
     print(f"🌍 Map saved as {html_filename}")
     print("\n🔍 Extracting values at specific locations...")
 
-    for lat, lon in LOCATIONS:
-        point = ee.Geometry.Point([lon, lat])
-        values = extract_point_values(collection, point)  # Extract values at the given point
-
-        # Extract values from a determined region
-        region_values = extract_region_values(collection, point)
+    # Extract the values at every location, and over a region around each one, with one request each.
+    points_values = extract_many_point_values(collection, LOCATIONS)
+    regions_values = extract_many_region_values(collection, LOCATIONS)
 
+    for (lat, lon), values, region_values in zip(LOCATIONS, points_values, regions_values):
         if values:
             print(f"Values at point ({lat}, {lon}): {values})")
             print(f"Averaged values in 100x100m area ({lat}, {lon}): {region_values}")
@@ -128,7 +170,8 @@ def generate_gifs():
         None
     """
     print("🗺️ Getting the monthly composites...")
-    composites, composites_era, dates = get_monthly_composites(GALLOCANTA_AOI, start_year=2018, end_year=2024,
+    gallocanta_aoi = get_gallocanta_aoi()
+    composites, composites_era, dates = get_monthly_composites(gallocanta_aoi, start_year=2018, end_year=2024,
                                                                index="NDMI")
 
     # Define NDMI ramp and visualization parameters.
@@ -145,29 +188,32 @@ def generate_gifs():
     ndmi_breaks, ndmi_palette = zip(*ndmi_ramp)
     ndmi_vis_params = {'min': -0.24, 'max': 0.24, 'palette': ndmi_palette}
 
+    # Fetch the AOI GeoJSON once and reuse it as the thumbnail region of every composite.
+    region = gallocanta_aoi.getInfo()
+
     print("🗺️ Downloading the monthly composites...")
-    urls_sen = [img.getThumbURL({
+    urls_sen = get_thumbnail_urls(composites, {
         'min': ndmi_vis_params['min'],
         'max': ndmi_vis_params['max'],
         'palette': ndmi_vis_params['palette'],
-        'region': GALLOCANTA_AOI.getInfo(),
+        'region': region,
         'dimensions': 512
-    }) for img in composites]
+    })
 
     era5_palette = ['#ffffcc', '#c2e699', '#78c679', '#31a354', '#006837']
-    urls = [img.getThumbURL({
+    urls = get_thumbnail_urls(composites_era, {
         'min': 0.0,
         'max': 1.0,
-        'region': GALLOCANTA_AOI.getInfo(),
+        'region': region,
         'palette': era5_palette,
         'dimensions': 512
-    }) for img in composites_era]
+    })
 
     print("🗺️ Creating gif...")
-    create_gif_from_urls(urls_sen, dates, "ndmi", GALLOCANTA_AOI,
-                         output_filename='laguna_gallocanta_evolucion_sen.gif', duration=10)
-    create_gif_from_urls(urls, dates, "era5", GALLOCANTA_AOI,
-                         output_filename='laguna_gallocanta_evolucion_2ms.gif', duration=10)
+    create_gif_from_urls(urls_sen, dates, "ndmi", gallocanta_aoi,
+                         output_filename='laguna_gallocanta_evolucion_sen.gif', duration=10, bbox=GALLOCANTA_AOI_BBOX)
+    create_gif_from_urls(urls, dates, "era5", gallocanta_aoi,
+                         output_filename='laguna_gallocanta_evolucion_2ms.gif', duration=10, bbox=GALLOCANTA_AOI_BBOX)
 
 def merge_gifs_menu():
     """
@@ -205,8 +251,8 @@ def run_all():
     """
     print("🚀 Starting complete process...")
     collection, era5_coll, image_collection, era5_collection = process_satellite_data()
-    extract_time_series_data(image_collection, era5_collection)
-    generate_time_series_plots()
+    if extract_time_series_data(image_collection, era5_collection):
+        generate_time_series_plots()
     create_interactive_map(collection, era5_coll)
     generate_gifs()
     merge_gifs_menu()
@@ -247,8 +293,7 @@ def main():
             if not data_processed:
                 print("⚠️ Error: You must run option 1 (Process satellite data) first.")
             else:
-                extract_time_series_data(image_collection, era5_collection)
-                series_extracted = True
+                series_extracted = extract_time_series_data(image_collection, era5_collection)
         elif choice == "3":
             if not series_extracted:
                 print("⚠️ Error: You must run option 2 (Extract time-series data) first.")
@@ -1,23 +1,80 @@
 import pandas as pd
+import functools
 import plotly.graph_objects as go
+from plotly.colors import DEFAULT_PLOTLY_COLORS
+from plotly.subplots import make_subplots
+from plotly_resampler import FigureResampler
 import webbrowser
 import os
 
-def plot_indices_per_point(csv_filename, save_figures=True):
+# Maximum number of points drawn per trace; longer series are downsampled (LTTB) by plotly-resampler.
+MAX_SHOWN_SAMPLES = 1000
+
+@functools.lru_cache(maxsize=8)
+def _load(path, mtime):
+    """
+    Parses a time-series file once per (path, modification time).
+
+    Args:
+        path (str): Path to the Parquet or CSV file.
+        mtime (float): Modification time of the file, so a rewritten file is parsed again.
+
+    Returns:
+        pandas.DataFrame: The time-series data, with the "Date" column parsed as datetimes and the index
+                          columns as float32.
+    """
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, engine="pyarrow", parse_dates=["Date"])
+
+    # Downcast the index values to float32 so the traces serialize half the bytes.
+    value_columns = [col for col in df.columns if col not in ["Date", "Latitude", "Longitude"]]
+    df[value_columns] = df[value_columns].astype("float32")
+    df["Date"] = df["Date"].astype("datetime64[ms]")
+    return df
+
+def load_time_series(csv_filename):
     """
-    Generates time-series plots for each geographic point, showing the evolution of all indices.
+    Loads the time-series data saved by save_to_csv, preferring its Parquet copy when it is up to date.
+
+    The parsed data is cached, so plotting the same file several times only reads it once. The returned
+    DataFrame is shared between callers and must not be modified in place.
+
+    Args:
+        csv_filename (str): Path to the CSV file containing the time-series data.
+
+    Returns:
+        pandas.DataFrame: The time-series data, with the "Date" column parsed as datetimes and the index
+                          columns as float32.
+    """
+    parquet_filename = csv_filename.replace(".csv", ".parquet")
+    path = csv_filename
+    # Only use the Parquet copy if it is at least as recent as the CSV, so a rewritten CSV is never shadowed
+    # by a leftover copy.
+    if os.path.exists(parquet_filename) and (not os.path.exists(csv_filename)
+                                             or os.path.getmtime(parquet_filename) >= os.path.getmtime(csv_filename)):
+        path = parquet_filename
+    return _load(path, os.path.getmtime(path))
+
+def plot_indices_per_point(csv_filename, save_figures=True, show=True):
+    """
+    Generates a time-series figure with one subplot per geographic point, showing the evolution of all indices.
 
     This function loads the CSV file containing extracted time-series data, identifies the available index columns
-    (excluding "Date", "Latitude", and "Longitude"), and then plots each index for each unique geographic point.
+    (excluding "Date", "Latitude", and "Longitude"), and then plots each index for each unique geographic point
+    in a single figure whose subplots share the date axis. Long series are downsampled to MAX_SHOWN_SAMPLES
+    points per trace.
 
     Args:
         csv_filename (str): Path to the CSV file containing the time-series data.
-        save_figures (bool): If True, saves each figure as an HTML file.
+        save_figures (bool): If True, saves the figure as an HTML file.
+        show (bool): If True, displays the figure with fig.show(). Disable for batch runs that only save HTML.
 
     Returns:
         None
     """
-    df = pd.read_csv(csv_filename)
+    df = load_time_series(csv_filename)
 
     # Determine the index columns (exclude 'Date', 'Latitude', 'Longitude')
     available_indices = [col for col in df.columns if col not in ["Date", "Latitude", "Longitude"]]
@@ -29,49 +86,62 @@ def plot_indices_per_point(csv_filename, save_figures=True):
     # Determine dataset name for title display based on file name
     satellite = "Sentinel_2" if "sentinel" in csv_filename.lower() else "ERA5"
 
-    # Get unique geographic points from the CSV data.
-    unique_points = df[['Latitude', 'Longitude']].drop_duplicates().values.tolist()
-
-    for lat, lon in unique_points:
-        df_point = df[(df['Latitude'] == lat) & (df['Longitude'] == lon)]
-        fig = go.Figure()
-
-        # Plot each available index for the current point.
-        for index in available_indices:
-            if index in df_point.columns:
-                fig.add_trace(go.Scatter(
-                    x=df_point["Date"], y=df_point[index], mode='lines+markers', name=index
-                ))
-
-        fig.update_layout(
-            title = f"{satellite} - Index Evolution at ({lat}, {lon})",
-            xaxis_title = "Date",
-            yaxis_title = "Index Value",
-            template = "plotly_dark"
-        )
-
+    # Split the CSV data by geographic point in a single pass.
+    groups = list(df.groupby(['Latitude', 'Longitude'], sort=False))
+
+    # One subplot row per point, sharing the date axis so zooming is synchronized across points.
+    fig = FigureResampler(
+        make_subplots(rows=len(groups), cols=1, shared_xaxes=True,
+                      subplot_titles=[f"({lat}, {lon})" for (lat, lon), _ in groups]),
+        default_n_shown_samples=MAX_SHOWN_SAMPLES
+    )
+    colors = DEFAULT_PLOTLY_COLORS
+
+    # Build every trace first and add them in a single call. Each index keeps the same color and legend
+    # entry in every row.
+    traces, rows = [], []
+    for row, ((lat, lon), df_point) in enumerate(groups, start=1):
+        dates = df_point["Date"].to_numpy()
+        for i, index in enumerate(available_indices):
+            traces.append(go.Scattergl(x=dates, y=df_point[index].to_numpy(), mode='lines+markers', name=index,
+                                       legendgroup=index, showlegend=row == 1,
+                                       line=dict(color=colors[i % len(colors)])))
+            rows.append(row)
+        fig.update_yaxes(title_text="Index Value", row=row, col=1)
+    fig.add_traces(traces, rows=rows, cols=[1] * len(rows))
+
+    fig.update_xaxes(title_text="Date", row=len(groups), col=1)
+    fig.update_layout(
+        title = f"{satellite} - Index Evolution per Location",
+        height = 300 * len(groups),
+        template = "plotly_dark",
+        uirevision = "constant"  # Keep the zoom/pan state when the figure is updated.
+    )
+
+    if show:
         fig.show()
 
-        # Save the figure as an HTML file if enabled.
-        if save_figures:
-            save_figure(fig, f"{satellite}_time_series_point_{lat}_{lon}", open_in_browser=False)
+    # Save the figure as an HTML file if enabled.
+    if save_figures:
+        save_figure(fig, f"{satellite}_time_series_points", open_in_browser=False)
 
-def plot_points_per_index(csv_filename, save_figures=True):
+def plot_points_per_index(csv_filename, save_figures=True, show=True):
     """
     Generates time-series plots for each index, showing its evolution across different locations.
 
     This function loads the CSV file containing the time-series data, identifies the index columns
     (excluding "Date", "Latitude", and "Longitude"), and then creates a plot for each index
-    where each location's time series is plotted.
+    where each location's time series is plotted. Long series are downsampled to MAX_SHOWN_SAMPLES points per trace.
 
     Args:
         csv_filename (str): Path to the CSV file containing the time-series data.
         save_figures (bool): If True, saves each figure as an HTML file.
+        show (bool): If True, displays each figure with fig.show(). Disable for batch runs that only save HTML.
 
     Returns:
         None
     """
-    df = pd.read_csv(csv_filename)
+    df = load_time_series(csv_filename)
 
     available_indices = [col for col in df.columns if col not in ["Date", "Latitude", "Longitude"]]
 
@@ -81,25 +151,27 @@ def plot_points_per_index(csv_filename, save_figures=True):
 
     satellite = "Sentinel_2" if "sentinel" in csv_filename.lower() else "ERA5"
 
-    for index in available_indices:
-        fig = go.Figure()
-        unique_points = df[['Latitude', 'Longitude']].drop_duplicates().values.tolist()
+    # Split the CSV data by geographic point once and reuse the groups for every index.
+    groups = list(df.groupby(['Latitude', 'Longitude'], sort=False))
 
-        for lat, lon in unique_points:
-            df_point = df[(df['Latitude'] == lat) & (df['Longitude'] == lon)]
-            if index in df_point.columns:  # Ensure the index exists for the point
-                fig.add_trace(go.Scatter(
-                    x=df_point["Date"], y=df_point[index], mode='lines+markers', name=f"({lat}, {lon})"
-                ))
+    for index in available_indices:
+        fig = FigureResampler(go.Figure(), default_n_shown_samples=MAX_SHOWN_SAMPLES)
+        fig.add_traces([
+            go.Scattergl(x=df_point["Date"].to_numpy(), y=df_point[index].to_numpy(), mode='lines+markers',
+                         name=f"({lat}, {lon})")
+            for (lat, lon), df_point in groups
+        ])
 
         fig.update_layout(
             title = f"{satellite} - Evolution of {index} Across Locations",
             xaxis_title = "Date",
             yaxis_title = f"{index} Value",
-            template = "plotly_dark"
+            template = "plotly_dark",
+            uirevision = "constant"
         )
 
-        fig.show()
+        if show:
+            fig.show()
 
         if save_figures:
             save_figure(fig, f"{satellite}_time_series_index_{index}", open_in_browser=False)
@@ -121,7 +193,8 @@ def save_figure(fig, filename, open_in_browser=True):
 
     # Save as HTML (interactive)
     html_path = os.path.abspath(f"{filename}.html")
-    fig.write_html(html_path)
+    # Reference plotly.js from its CDN instead of embedding the ~3.5 MB bundle in every file.
+    fig.write_html(html_path, include_plotlyjs="cdn", full_html=True, auto_open=False, validate=False)
 
     print(f"Saved: {filename}.html")
 
@@ -1,11 +1,15 @@
 import ee
 
+# Tile scaling factor for the reductions: smaller tiles use less memory per worker, which avoids
+# "memory limit exceeded" errors and lets Earth Engine spread the work over more workers.
+TILE_SCALE = 4
+
 def extract_point_values(image, point, scale=10):
     """
     Extracts the values of bands or computed indices (e.g., NDVI) at a specified point.
 
-    This function verifies that the given point is within the image bounds and then computes
-    the mean value of each band at that point using reduceRegion.
+    This function computes the mean value of each band at that point using reduceRegion. Points outside the
+    image bounds get no valid values, so no separate bounds check is needed.
 
     Args:
         image (ee.Image): The image or mosaic from which to extract the values.
@@ -18,22 +22,18 @@ def extract_point_values(image, point, scale=10):
               or the point is out of bounds.
     """
     try:
-        # Ensure the point is within the image bounds
-        region = image.geometry()
-        if not region.contains(point, 1).getInfo():
-            print(f"Point {point.getInfo()} is outside the image bounds.")
-            return None
-
         # Reduce the image at the specified point to extract band values.
         values = image.reduceRegion(
-            reducer=ee.Reducer.mean(),  # Use the mean reducer for extraction.
+            reducer=ee.Reducer.mean().unweighted(),  # Plain mean, no per-pixel area weighting.
             geometry=point,             # The point where values are extracted.
             scale=scale,                # Spatial resolution in meters.
-            maxPixels=1e6
+            bestEffort=True,            # Coarsen the scale instead of failing if maxPixels is exceeded.
+            maxPixels=1e4,
+            tileScale=TILE_SCALE
         ).getInfo() # Convert the result to a Python dictionary.
 
-        # Check if the values are valid (not None)
-        if values:
+        # Check if the values are valid (points outside the image bounds come back empty or all None)
+        if values and any(value is not None for value in values.values()):
             return values
         else:
             print("No data available at the specified point.")
@@ -59,20 +59,116 @@ def extract_region_values(image, center_point, scale=10):
         dict: A dictionary of band values averaged over the defined region, or None if data is unavailable.
     """
     try:
-        lon, lat = center_point.getInfo()['coordinates']
-        # Define a 100x100 meter region around the point.
-        region = ee.Geometry.Rectangle([
-            lon - 0.00045, lat - 0.00045, lon + 0.00045, lat + 0.00045
-        ])
+        # Define a 100x100 meter region around the point (built server-side, no getInfo round-trip).
+        region = center_point.buffer(50).bounds()
 
         values = image.reduceRegion(
-            reducer=ee.Reducer.mean(),  # Average values within the region.
+            reducer=ee.Reducer.mean().unweighted(),  # Average values within the region.
             geometry=region,
             scale=scale,
-            maxPixels=1e6
+            bestEffort=True,
+            maxPixels=1e4,
+            tileScale=TILE_SCALE
         ).getInfo()
 
         return values if values else None
     except Exception as e:
         print(f"Error extracting region values: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def locations_collection(locations, region_radius=None):
+    """
+    Builds a FeatureCollection with one feature per location, tagged with its position in the list.
+
+    Args:
+        locations (list of tuple): List of (latitude, longitude) coordinates.
+        region_radius (float, optional): If given, each feature is the square region of this half-size
+                                         (in meters) around the point instead of the point itself.
+
+    Returns:
+        ee.FeatureCollection: The features, each with an 'id' property matching its index in locations.
+    """
+    features = []
+    for i, (lat, lon) in enumerate(locations):
+        geometry = ee.Geometry.Point([lon, lat])
+        if region_radius is not None:
+            geometry = geometry.buffer(region_radius).bounds()
+        features.append(ee.Feature(geometry, {'id': i}))
+    return ee.FeatureCollection(features)
+
+def _reduce_locations(image, locations_fc, num_locations, scale):
+    """
+    Computes the mean band values of the image at every location with a single reduceRegions request.
+
+    Args:
+        image (ee.Image): The image or mosaic from which to extract the values.
+        locations_fc (ee.FeatureCollection): Locations built with locations_collection.
+        num_locations (int): Number of locations in the collection.
+        scale (int): The spatial resolution (in meters) to use for extraction.
+
+    Returns:
+        list: One dictionary of band values per location (in the same order), or None where no data is available.
+    """
+    reduced = image.reduceRegions(
+        collection=locations_fc,
+        reducer=ee.Reducer.mean().unweighted(),
+        scale=scale,
+        tileScale=TILE_SCALE
+    ).getInfo()
+
+    results = [None] * num_locations
+    for feature in reduced['features']:
+        values = dict(feature['properties'])
+        index = values.pop('id')
+        if any(value is not None for value in values.values()):
+            results[index] = values
+    return results
+
+def extract_many_point_values(image, locations, scale=10, locations_fc=None):
+    """
+    Extracts the values of bands or computed indices at several points with a single Earth Engine request.
+
+    Args:
+        image (ee.Image): The image or mosaic from which to extract the values.
+        locations (list of tuple): List of (latitude, longitude) coordinates.
+        scale (int, optional): The spatial resolution (in meters) to use for extraction.
+                               (Default: 10 for Sentinel-2.)
+        locations_fc (ee.FeatureCollection, optional): The locations already built with locations_collection,
+                                                       to reuse it across several images.
+
+    Returns:
+        list: One dictionary of band values per location, or None where no data is available.
+              If the request fails, every entry is None.
+    """
+    try:
+        if locations_fc is None:
+            locations_fc = locations_collection(locations)
+        return _reduce_locations(image, locations_fc, len(locations), scale)
+    except Exception as e:
+        print(f"Error extracting point values: {e}")
+        return [None] * len(locations)
+
+def extract_many_region_values(image, locations, scale=10, regions_fc=None):
+    """
+    Extracts the average band values from a 100x100 meter area around several points with a single request.
+
+    Args:
+        image (ee.Image): The image or mosaic from which to extract the values.
+        locations (list of tuple): List of (latitude, longitude) coordinates.
+        scale (int, optional): The spatial resolution (in meters) to use for extraction.
+                               (Default: 10 for Sentinel-2.)
+        regions_fc (ee.FeatureCollection, optional): The regions already built with
+                                                     locations_collection(locations, region_radius=50),
+                                                     to reuse them across several images.
+
+    Returns:
+        list: One dictionary of averaged band values per location, or None where data is unavailable.
+              If the request fails, every entry is None.
+    """
+    try:
+        if regions_fc is None:
+            regions_fc = locations_collection(locations, region_radius=50)
+        return _reduce_locations(image, regions_fc, len(locations), scale)
+    except Exception as e:
+        print(f"Error extracting region values: {e}")
+        return [None] * len(locations)
@@ -1,6 +1,41 @@
 import ee
+import functools
 from config import END_DATE, ERA5_BANDS
 
+# Spectral indices computed by calculate_indices as (first - second) / (first + second).
+INDEX_NAMES = ['NDVI', 'NDMI', 'NDWI', 'NDSI']
+INDEX_FIRST_BANDS = ['B8', 'B8', 'B3', 'B3']
+INDEX_SECOND_BANDS = ['B4', 'B11', 'B8', 'B11']
+
+# QA60 bit masks for clouds (bit 10) and cirrus (bit 11), combined into one mask value.
+QA60_CLOUD_MASK = (1 << 10) | (1 << 11)
+
+# Neighborhood (in pixels) searched for clouds when computing the cloud distance band; pixels farther than this
+# from any cloud get this value.
+CLOUD_DISTANCE_NEIGHBORHOOD = 256
+
+# NDSI value above which a pixel is considered snow.
+NDSI_SNOW_THRESHOLD = 0.4
+
+# Every index has B8 or B3 as its first band, so where both are positive no index denominator can be zero.
+DENOMINATOR_BANDS = ['B8', 'B3']
+
+@functools.lru_cache(maxsize=16)
+def make_aoi_filter(aoi):
+    """
+    Builds the filter that keeps the images intersecting an Area of Interest (AOI).
+
+    The filter uses the bounding box of the AOI, which is cheaper to test than a complex polygon, and it is
+    built once per AOI and reused by every collection filtered with it.
+
+    Args:
+        aoi (ee.Geometry): The area of interest.
+
+    Returns:
+        ee.Filter: A bounds filter on the AOI bounding box.
+    """
+    return ee.Filter.bounds(aoi.bounds())
+
 def mask_s2_clouds(image):
     """
     Applies a cloud and cirrus mask to a Sentinel-2 image using the QA60 band.
@@ -18,13 +53,8 @@ def mask_s2_clouds(image):
         # Select the QA60 band (used as a cloud mask).
         qa = image.select('QA60')
 
-        # Define bit masks for clouds (bit 10) and cirrus (bit 11).
-        cloud_bit_mask = 1 << 10
-        cirrus_bit_mask = 1 << 11
-
-        # Create a mask where both cloud and cirrus bits are equal to zero.
-        mask = (qa.bitwiseAnd(cloud_bit_mask).eq(0)) \
-            .And(qa.bitwiseAnd(cirrus_bit_mask).eq(0))
+        # Create a mask where both cloud and cirrus bits are equal to zero, with a single bitwise test.
+        mask = qa.bitwiseAnd(QA60_CLOUD_MASK).eq(0)
 
         # Apply the mask to the original image
         return image.updateMask(mask)
@@ -48,12 +78,32 @@ def calculate_indices(image):
     Returns:
         ee.Image: The input image with additional bands for NDVI, NDMI, NDWI, and NDSI.
     """
-    ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-    ndmi = image.normalizedDifference(['B8', 'B11']).rename('NDMI')
-    ndwi = image.normalizedDifference(['B3', 'B8']).rename('NDWI')
-    ndsi = image.normalizedDifference(['B3', 'B11']).rename('NDSI')
+    # Stack the first and second band of every index so the four normalized differences are computed
+    # band-wise in a single (A - B) / (A + B) operation.
+    first = image.select(INDEX_FIRST_BANDS, INDEX_NAMES).toFloat()
+    second = image.select(INDEX_SECOND_BANDS, INDEX_NAMES).toFloat()
+    indices = first.subtract(second).divide(first.add(second))
+
+    return image.addBands(indices) # Add indices as a new bands to the image
+
+def preprocess(image):
+    """
+    Applies the cloud mask and calculates the spectral indices of a Sentinel-2 image in a single step.
+
+    Mapping this function once over a collection adds one function node per image to the Earth Engine graph,
+    instead of one for mask_s2_clouds and another for calculate_indices. The cloud mask is combined with a
+    valid-data mask (pixels where an index denominator would be zero) and applied with a single updateMask,
+    so the indices never contain NaN values for the reducers to propagate.
 
-    return image.addBands([ndvi, ndmi, ndwi, ndsi]) # Add indices as a new bands to the image
+    Args:
+        image (ee.Image): A Sentinel-2 image to process.
+
+    Returns:
+        ee.Image: The masked image with additional bands for NDVI, NDMI, NDWI, and NDSI.
+    """
+    clear = image.select('QA60').bitwiseAnd(QA60_CLOUD_MASK).eq(0)
+    valid = image.select(DENOMINATOR_BANDS).reduce(ee.Reducer.min()).gt(0)
+    return calculate_indices(image.updateMask(clear.And(valid)))
 
 def process_image_collection(aoi):
     """
@@ -71,17 +121,67 @@ def process_image_collection(aoi):
     """
     collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED') \
         .filterDate('2024-12-01', '2024-12-31') \
-        .filter(ee.Filter.bounds(aoi)) \
-        .map(mask_s2_clouds) \
-        .map(calculate_indices)
+        .filter(make_aoi_filter(aoi)) \
+        .map(preprocess)
     return collection.median()
 
+def add_cloud_distance(image):
+    """
+    Adds a band with the distance (in pixels) from each pixel to the nearest cloud or cirrus in the QA60 band.
+
+    Args:
+        image (ee.Image): A Sentinel-2 image, including the QA60 band.
+
+    Returns:
+        ee.Image: The input image with an additional 'cloud_distance' band.
+    """
+    cloud = image.select('QA60').bitwiseAnd(QA60_CLOUD_MASK).neq(0)
+    distance = cloud.fastDistanceTransform(CLOUD_DISTANCE_NEIGHBORHOOD).sqrt() \
+        .unmask(CLOUD_DISTANCE_NEIGHBORHOOD) \
+        .rename('cloud_distance')
+    return image.addBands(distance)
+
+def add_snow_band(image):
+    """
+    Adds an 'NDSI_snow' band with the NDSI values of the snow pixels only (NDSI >= NDSI_SNOW_THRESHOLD).
+
+    Args:
+        image (ee.Image): An image with the NDSI band (see calculate_indices).
+
+    Returns:
+        ee.Image: The input image with the additional 'NDSI_snow' band.
+    """
+    ndsi = image.select('NDSI')
+    return image.addBands(ndsi.updateMask(ndsi.gte(NDSI_SNOW_THRESHOLD)).rename('NDSI_snow'))
+
+def get_preview_composite(aoi):
+    """
+    Builds a Sentinel-2 composite for display, using the same period and processing as process_image_collection.
+
+    Instead of reducing every image pixel-wise with a median, the composite is a quality mosaic that takes, for
+    each pixel, the image where it is farthest from any cloud. A mosaic only reads the selected pixel of each
+    tile, so map layers load much faster; use process_image_collection for extracting values.
+
+    Args:
+        aoi (ee.Geometry): The area of interest to filter the image collection.
+
+    Returns:
+        ee.Image: A cloud-masked mosaic that includes additional bands (NDVI, NDMI, NDWI, NDSI and NDSI_snow).
+    """
+    collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED') \
+        .filterDate('2024-12-01', '2024-12-31') \
+        .filter(make_aoi_filter(aoi)) \
+        .map(lambda image: preprocess(add_cloud_distance(image)))
+    return add_snow_band(collection.qualityMosaic('cloud_distance'))
+
+@functools.lru_cache(maxsize=64)
 def get_era5_collection(aoi, start_date, end_date=END_DATE):
     """
     Retrieves ECMWF ERA5-Land soil moisture data for the specified AOI and time range.
 
     The function loads the ERA5-Land hourly dataset, filters it by the provided date range and AOI,
-    and selects the specified bands defined in the configuration.
+    and selects the specified bands defined in the configuration. Results are cached per AOI and dates
+    (Earth Engine objects hash by value), so repeated calls reuse the same collection.
 
     Args:
         aoi (ee.Geometry): The area of interest for extracting soil moisture data.
@@ -92,8 +192,8 @@ def get_era5_collection(aoi, start_date, end_date=END_DATE):
         ee.ImageCollection: The ERA5-Land image collection filtered by date and AOI, with the selected bands.
     """
     collection = ee.ImageCollection("ECMWF/ERA5_LAND/HOURLY") \
-        .filter(ee.Filter.date(start_date, end_date)) \
-        .filter(ee.Filter.bounds(aoi)) \
+        .filterDate(start_date, end_date) \
+        .filter(make_aoi_filter(aoi)) \
         .select(ERA5_BANDS)
 
     return collection
\ No newline at end of file
@@ -1,20 +1,47 @@
 import ee
-import csv
+import os
 import sys
 import datetime
 import time
-import threading
-from processing import calculate_indices, mask_s2_clouds
-from point_extraction import extract_point_values, extract_region_values
+import itertools
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from io import BytesIO
+from tqdm import tqdm
+from google.cloud import storage
+from auth import get_credentials, USER_PROJECT
+from processing import preprocess, make_aoi_filter, INDEX_NAMES
+from point_extraction import locations_collection, TILE_SCALE
 from config import END_DATE
 
 TIME_INTERVAL = 7 # Time interval in days for weekly aggregation
+BATCH_SIZE = 26 # Number of intervals computed server-side per Earth Engine request
+MAX_WORKERS = 8 # Number of batches requested concurrently
+PARALLEL_SCALE = 4 # Split factor for median/mean composites, to avoid "User memory limit exceeded" errors
 
+# Optional Cloud Storage bucket: if set, time series are exported there with an Earth Engine task instead
+# of being downloaded with getInfo() (recommended for very long series or many locations).
+EXPORT_BUCKET = os.environ.get("EE_EXPORT_BUCKET")
+EXPORT_POLL_INTERVAL = 10 # Seconds between export task status checks
+
+# Ways of compositing the images of each interval (ee.ImageCollection methods).
+COMPOSITES = ("median", "mean", "mosaic", "first")
+
+# Sentinel-2 spectral bands kept in the weekly collection (the remaining bands cause problems when compositing).
+SPECTRAL_BANDS = ["B1", "B2", "B3", "B4", "B5", "B6", "B7", "B8", "B8A", "B9", "B11", "B12"]
+
+@functools.lru_cache(maxsize=64)
 def get_weekly_image_collection(aoi, start_date, end_date=END_DATE):
     """
     Retrieves a Sentinel-2 image collection filtered by the given Area of Interest (AOI)
     and time range. The collection is pre-processed to calculate vegetation and water indices.
 
+    Earth Engine objects hash by value, so repeated calls with the same AOI and dates return the same
+    collection object instead of rebuilding its graph.
+
     Args:
         aoi (ee.Geometry): The Area of Interest used for filtering the image collection.
         start_date (str): Start date in "YYYY-MM-DD" format.
@@ -23,15 +50,16 @@ def get_weekly_image_collection(aoi, start_date, end_date=END_DATE):
     Returns:
         ee.ImageCollection: A Sentinel-2 image collection with calculated indices, containing only the selected bands.
     """
+    # Keep only the spectral bands plus QA60 (needed by the cloud mask) before mapping, so the remaining
+    # bands are never loaded.
     collection = ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED") \
         .filterDate(start_date, end_date) \
-        .filter(ee.Filter.bounds(aoi)) \
-        .map(mask_s2_clouds) \
-        .map(calculate_indices) # Add calculated indices
+        .filter(make_aoi_filter(aoi)) \
+        .select(SPECTRAL_BANDS + ["QA60"]) \
+        .map(preprocess) # Apply the cloud mask and add calculated indices
 
     # Select only essential bands (remove problem bands)
-    selected_bands = ["B1", "B2", "B3", "B4", "B5", "B6", "B7", "B8", "B8A", "B9",
-                      "B11", "B12", "NDVI", "NDMI", "NDWI", "NDSI"]
+    selected_bands = SPECTRAL_BANDS + INDEX_NAMES
 
     return collection.select(selected_bands)  # Ensure all images have only these bands
 
@@ -48,17 +76,21 @@ def calculate_ndmi(image):
     ndmi = image.normalizedDifference(['B8', 'B11']).rename('NDMI')
     return image.addBands([ndmi]) # Add indices as a new bands to the image
 
-def get_monthly_composites(aoi, start_year, end_year, index=None):
+def get_monthly_composites(aoi, start_year, end_year, index=None, parallel_scale=PARALLEL_SCALE):
     """
     Generates a list of monthly composite images for the specified period.
     Each composite is produced by filtering the Sentinel-2 collection for a given month,
     applying the NDMI calculation (or any other index if specified), and taking the median.
 
+    All the months are built server-side from a single mapped ee.List, so no request is made here; each
+    composite also carries its month ('date') and number of images ('n_images') as properties.
+
     Args:
         aoi (ee.Geometry): The Area of Interest.
         start_year (int): The starting year.
         end_year (int): The ending year.
         index (str, optional): If specified, only that band is selected from the median composite.
+        parallel_scale (int, optional): Split factor for the median reductions (see _composite_image).
 
     Returns:
         tuple: A tuple containing three lists:
@@ -66,62 +98,230 @@ def get_monthly_composites(aoi, start_year, end_year, index=None):
             - composites_era (list of ee.Image): The monthly ERA5 composite images.
             - dates (list of str): The date (as a string) corresponding to each composite.
     """
-    composites = []
-    composites_era = []
-    dates = []
-    current = datetime.datetime(start_year, 1, 1)
-    end_date = datetime.datetime(end_year, 12, 31)
-
-    while current <= end_date:
-        start_str = current.strftime('%Y-%m-%d')
-        # Define the end of the month by moving to the start of the next month
-        if current.month == 12:
-            next_month = datetime.datetime(current.year + 1, 1, 1)
-        else:
-            next_month = datetime.datetime(current.year, current.month + 1, 1)
-        end_str = next_month.strftime('%Y-%m-%d')
-
-        # Filter the Sentinel-2 collection and compute NDMI
-        collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED') \
-            .filterDate(start_str, end_str) \
-            .filterBounds(aoi) \
-            .map(calculate_ndmi)
-            # Optionally, add: .map(mask_s2_clouds) or .map(calculate_indices)
-
-        # Filter the ERA5 collection for the same period and AOI
-        collection_era = ee.ImageCollection("ECMWF/ERA5_LAND/HOURLY") \
-            .filter(ee.Filter.date(start_str, end_str)) \
-            .filter(ee.Filter.bounds(aoi)) \
-            .select("volumetric_soil_water_layer_4")
-
-        # Print the number of images available for debugging
-        size_s2 = collection.size().getInfo()
-        size_era = collection_era.size().getInfo()
-        print(f"\r{start_str} - Sentinel-2: {size_s2} images, ERA5: {size_era} images.", end="", flush=True)
+    n_months = (end_year - start_year + 1) * 12
+    first_month = ee.Date.fromYMD(start_year, 1, 1)
+
+    collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED').filter(make_aoi_filter(aoi))
 
+    collection_era = ee.ImageCollection("ECMWF/ERA5_LAND/HOURLY") \
+        .filter(make_aoi_filter(aoi)) \
+        .select("volumetric_soil_water_layer_4")
+
+    def monthly_s2(i):
+        start = first_month.advance(i, 'month')
+        filtered = collection.filterDate(start, start.advance(1, 'month'))
+        # Optionally, map preprocess instead to mask clouds and calculate all indices
+        composite = _composite_image(filtered.map(calculate_ndmi), "median", parallel_scale)
         if index:
-            composite = collection.median().select(index)
-            composite_era = collection_era.median()
-            composites.append(composite)
-            composites_era.append(composite_era)
-        else:
-            composite = collection.median()
-            composite_era = collection_era.median()
-            composites.append(composite)
-            composites_era.append(composite_era)
-
-        dates.append(start_str)
-        current = next_month
-
-    print("\n")
+            composite = composite.select(index)
+        return composite.set({'date': start.format('YYYY-MM-dd'), 'n_images': filtered.size()})
+
+    def monthly_era(i):
+        start = first_month.advance(i, 'month')
+        filtered = collection_era.filterDate(start, start.advance(1, 'month'))
+        composite = _composite_image(filtered, "median", parallel_scale)
+        return composite.set({'date': start.format('YYYY-MM-dd'), 'n_images': filtered.size()})
+
+    months = ee.List.sequence(0, n_months - 1)
+    s2_monthly = months.map(monthly_s2)
+    era_monthly = months.map(monthly_era)
+
+    composites = [ee.Image(s2_monthly.get(i)) for i in range(n_months)]
+    composites_era = [ee.Image(era_monthly.get(i)) for i in range(n_months)]
+    dates = [f"{start_year + i // 12}-{i % 12 + 1:02d}-01" for i in range(n_months)]
+
     return composites, composites_era, dates
 
-def extract_time_series(image_collection, locations, bands, scale, start_date, dataset_name, time_interval=TIME_INTERVAL):
+def _interval_starts(start_date, time_interval):
+    """
+    Computes the start dates of every aggregation interval between start_date and END_DATE.
+
+    Args:
+        start_date (str): Start date ("YYYY-MM-DD") of the first interval.
+        time_interval (int): Number of days for each aggregation interval.
+
+    Returns:
+        list of str: Start dates ("YYYY-MM-DD") of the intervals; the last one starts on or before END_DATE.
+    """
+    start = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+    total_days = (datetime.datetime.strptime(END_DATE, "%Y-%m-%d") - start).days
+    return [(start + datetime.timedelta(days=time_interval * i)).strftime("%Y-%m-%d")
+            for i in range(total_days // time_interval + 1)]
+
+def _default_composite(composite, dataset_name):
+    """
+    Returns the composite to use for a dataset: median for Sentinel-2 and mean for ERA5-Land unless another
+    one is requested.
+
+    Raises:
+        ValueError: If the composite is not one of COMPOSITES.
+    """
+    if composite is None:
+        composite = "median" if dataset_name == "Sentinel-2" else "mean"
+    if composite not in COMPOSITES:
+        raise ValueError(f"Unknown composite '{composite}', expected one of {COMPOSITES}.")
+    return composite
+
+def _composite_image(collection, composite, parallel_scale=PARALLEL_SCALE):
+    """
+    Composites an image collection with one of COMPOSITES.
+
+    Median and mean are computed with ImageCollection.reduce and parallelScale, which splits the reduction
+    across more workers with a smaller memory budget each; the output bands keep the input band names.
+
+    Args:
+        collection (ee.ImageCollection): The images to composite.
+        composite (str): One of COMPOSITES.
+        parallel_scale (int, optional): Split factor for median and mean reductions.
+
+    Returns:
+        ee.Image: The composite image.
+    """
+    if composite in ("median", "mean"):
+        reducer = getattr(ee.Reducer, composite)()
+        return collection.reduce(reducer, parallel_scale).rename(collection.first().bandNames())
+    return getattr(collection, composite)()
+
+def _output_columns(bands, dataset_name):
+    """
+    Returns the columns of the saved time series: the date and location, then each band (followed by its
+    100x100m region mean for Sentinel-2).
+
+    Args:
+        bands (list of str): List of bands/indices extracted.
+        dataset_name (str): Name of the dataset.
+
+    Returns:
+        list of str: The column names, in order.
+    """
+    columns = ["Date", "Latitude", "Longitude"]
+    for band in bands:
+        columns.append(band)
+        if dataset_name == "Sentinel-2":
+            columns.append(f"{band}_region")
+    return columns
+
+def _intervals_collection(image_collection, interval_starts, time_interval, composite, points_fc, regions_fc,
+                          scale, parallel_scale=PARALLEL_SCALE):
+    """
+    Builds the composite of several time intervals reduced at every location, as one server-side collection.
+
+    The collection is flattened: for each interval, the composite is sampled at the points and reduced over the
+    100x100m regions, and every resulting feature is tagged with the interval date, the kind of geometry and
+    the number of images in the interval. Intervals without images produce no features, and points whose pixel
+    is masked are left out.
+
+    Args:
+        image_collection (ee.ImageCollection): The image collection to process.
+        interval_starts (list of str): Start dates ("YYYY-MM-DD") of the intervals in the batch.
+        time_interval (int): Number of days for each aggregation interval.
+        composite (str): How each interval is composited; one of COMPOSITES.
+        points_fc (ee.FeatureCollection): The points built with locations_collection.
+        regions_fc (ee.FeatureCollection): The 100x100m regions built with locations_collection, or None to
+                                           reduce only the points.
+        scale (int): Spatial resolution (in meters) for the point extraction.
+        parallel_scale (int, optional): Split factor for median and mean composites.
+
+    Returns:
+        ee.FeatureCollection: One feature per interval, location and kind of geometry.
+    """
+    reducer = ee.Reducer.mean().unweighted()
+
+    def reduce_interval(date_str):
+        start = ee.Date(date_str)
+        filtered = image_collection.filterDate(start, start.advance(time_interval, 'day'))
+        image = _composite_image(filtered, composite, parallel_scale)
+        n_images = filtered.size()
+
+        # Sample the pixel under each point directly; no reducer is needed for a single pixel.
+        reduced = image.sampleRegions(collection=points_fc, scale=scale, tileScale=TILE_SCALE, geometries=False) \
+            .map(lambda feature: feature.set('kind', 'point'))
+        if regions_fc is not None:
+            regions = image.reduceRegions(collection=regions_fc, reducer=reducer, scale=10, tileScale=TILE_SCALE) \
+                .map(lambda feature: feature.set('kind', 'region'))
+            reduced = reduced.merge(regions)
+        reduced = reduced.map(lambda feature: feature.set({'Date': date_str, 'n_images': n_images}))
+
+        return ee.Algorithms.If(n_images.gt(0), reduced, ee.FeatureCollection([]))
+
+    return ee.FeatureCollection(ee.List(interval_starts).map(reduce_interval)).flatten()
+
+def _reduce_intervals(image_collection, interval_starts, time_interval, composite, points_fc, regions_fc, scale,
+                      parallel_scale=PARALLEL_SCALE):
+    """
+    Reduces the composite of several time intervals at every location in a single Earth Engine request.
+
+    The composites of the batch are stacked into the bands of one image with toBands (named "<date>_<band>"),
+    which is reduced once over the points and once over the 100x100m regions, instead of once per interval.
+    The wide result is reshaped client-side into one set of values per interval, location and kind of geometry.
+    Intervals without images produce no values.
+
+    Args:
+        image_collection (ee.ImageCollection): The image collection to process.
+        interval_starts (list of str): Start dates ("YYYY-MM-DD") of the intervals in the batch.
+        time_interval (int): Number of days for each aggregation interval.
+        composite (str): How each interval is composited; one of COMPOSITES.
+        points_fc (ee.FeatureCollection): The points built with locations_collection.
+        regions_fc (ee.FeatureCollection): The 100x100m regions built with locations_collection, or None to
+                                           reduce only the points.
+        scale (int): Spatial resolution (in meters) for the point extraction.
+        parallel_scale (int, optional): Split factor for median and mean composites.
+
+    Returns:
+        list of dict: The band values of each interval and location, with their 'Date', 'kind' ("point" or
+                      "region"), location 'id' and 'n_images' in the interval.
+    """
+    # Intervals without images are stacked as a fully masked image with the same bands.
+    band_names = image_collection.first().bandNames()
+    empty = ee.Image.constant(ee.List.repeat(0, band_names.size())).rename(band_names).updateMask(0)
+
+    def composite_interval(date_str):
+        start = ee.Date(date_str)
+        filtered = image_collection.filterDate(start, start.advance(time_interval, 'day'))
+        n_images = filtered.size()
+        image = ee.Image(ee.Algorithms.If(n_images.gt(0), _composite_image(filtered, composite, parallel_scale),
+                                          empty))
+        return image.set({'system:index': date_str, 'n_images': n_images})
+
+    composites = ee.ImageCollection.fromImages(ee.List(interval_starts).map(composite_interval))
+    stacked = composites.toBands()
+
+    # first() keeps masked pixels as nulls, so a location is not dropped because a single interval is masked.
+    points = stacked.reduceRegions(collection=points_fc, reducer=ee.Reducer.first().forEachBand(stacked),
+                                   scale=scale, tileScale=TILE_SCALE)
+    batch = {'point': points, 'n_images': composites.aggregate_array('n_images')}
+    if regions_fc is not None:
+        batch['region'] = stacked.reduceRegions(collection=regions_fc,
+                                                reducer=ee.Reducer.mean().unweighted().forEachBand(stacked),
+                                                scale=10, tileScale=TILE_SCALE)
+    batch = ee.Dictionary(batch).getInfo()
+
+    n_images = dict(zip(interval_starts, batch.pop('n_images')))
+    results = []
+    for kind, reduced in batch.items():
+        for feature in reduced['features']:
+            properties = feature['properties']
+            values = {date_str: {'Date': date_str, 'kind': kind, 'id': properties['id'],
+                                 'n_images': n_images[date_str]}
+                      for date_str in interval_starts if n_images[date_str]}
+            for key, value in properties.items():
+                date_str, _, band = key.partition('_')
+                if date_str in values:
+                    values[date_str][band] = value
+            results.extend(values.values())
+    return results
+
+def extract_time_series(image_collection, locations, bands, scale, start_date, dataset_name, time_interval=TIME_INTERVAL,
+                        batch_size=BATCH_SIZE, max_workers=MAX_WORKERS, composite=None,
+                        parallel_scale=PARALLEL_SCALE):
     """
     Extracts time-series data from a satellite image collection for specified geographic points.
 
-    The function aggregates images using a median (for Sentinel-2) or mean (for ERA5-Land),
+    The function aggregates images using a median (for Sentinel-2) or mean (for ERA5-Land) by default,
     and then extracts pixel values at the given locations, along with values averaged over small regions.
+    Intervals are computed server-side in batches, with a single request per batch, and the batches are
+    requested concurrently. The values of each batch are yielded as soon as it arrives, in columnar form, so
+    they can be written to disk without holding the whole series in memory (see save_to_csv).
 
     Args:
         image_collection (ee.ImageCollection): The image collection to process.
@@ -131,115 +331,236 @@ def extract_time_series(image_collection, locations, bands, scale, start_date, d
         start_date (str): Start date ("YYYY-MM-DD") for time-series extraction.
         dataset_name (str): Name of the dataset (used for progress messages).
         time_interval (int, optional): Number of days for each aggregation interval.
-
-    Returns:
-        list of dict: A list of dictionaries with extracted values for each point and time interval.
+        batch_size (int, optional): Number of intervals computed per Earth Engine request.
+        max_workers (int, optional): Number of batches requested concurrently.
+        composite (str, optional): How each interval is composited: "median", "mean", "mosaic" or "first".
+                                   Defaults to median for Sentinel-2 and mean otherwise. "mosaic" (top-most
+                                   unmasked pixel) and "first" avoid a per-pixel reduction over every image
+                                   and are several times faster, at the cost of not smoothing the interval.
+        parallel_scale (int, optional): Split factor for median and mean composites; raise it if Earth Engine
+                                        reports "User memory limit exceeded".
+
+    Yields:
+        dict of list: The extracted values of one batch of intervals, in chronological order, as one list
+                      per column ("Date", "Latitude", "Longitude" and the bands).
     """
-    results = []
-    start = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-    end = datetime.datetime.strptime(END_DATE, "%Y-%m-%d")
-
-    total_intervals = (end - start).days // time_interval + 1  # Total number of iterations
-    processed_intervals = 0  # Counter for processed intervals
+    # Start dates of every aggregation interval, computed once up front.
+    interval_starts = _interval_starts(start_date, time_interval)
 
+    total_intervals = len(interval_starts)  # Total number of intervals
     start_time = time.time()  # Start the timer
-    elapsed_time = 0  # Store elapsed time
-    stop_timer = False  # Control variable for stopping the timer
-    num_images = 0
-    progress = 0
-
-    # Function to update elapsed time progress in a separate thread.
-    def update_timer():
-        nonlocal elapsed_time
-        while not stop_timer:
-            elapsed_time = time.time() - start_time
-            elapsed_time_str = str(datetime.timedelta(seconds=int(elapsed_time)))
-            sys.stdout.write(f"\r[{dataset_name}] Processing time-series: {progress:.2f}% complete | "
-                             f"Number of images for this week: {num_images} | Time elapsed: {elapsed_time_str}")
-            sys.stdout.flush()
-            time.sleep(1)  # Wait for 1 second before updating again
-
-    # Start the timer thread
-    timer_thread = threading.Thread(target=update_timer)
-    timer_thread.start()
-
-    while start <= end:
-        # Convert current date to string format
-        date_str = start.strftime("%Y-%m-%d")
-
-        # Filter the image collection for the current week
-        filtered = image_collection.filterDate(
-            date_str,
-            (start + datetime.timedelta(days=time_interval)).strftime("%Y-%m-%d")
-        )
-        # Use median for Sentinel-2 and mean for ERA5-Land
-        image = filtered.median() if dataset_name == "Sentinel-2" else filtered.mean()  # Sentinel-2 uses median, ERA5 uses mean
-
-        num_images = filtered.size().getInfo()  # Get number of images in the filtered collection
-
-        if image:
-            for lat, lon in locations:
-                point = ee.Geometry.Point([lon, lat])
-                values = extract_point_values(image, point, scale=scale)
-                region_values = extract_region_values(image, point, scale=10)
-
-                # Store extracted values if available
-                if values:
-                    row = {
-                        "Date": date_str,
-                        "Latitude": lat,
-                        "Longitude": lon
-                    }
-                    for band in bands:
-                        row[band] = values.get(band, None) # Retrieve values for each index
-                        if dataset_name == "Sentinel-2":
-                            row[f"{band}_region"] = region_values.get(band, None) if region_values else None # Retrieve 100x100m region values
-                    results.append(row)
-
-        # Update progress
-        processed_intervals += 1
-        progress = (processed_intervals / total_intervals) * 100
-
-        # Move to the next time interval
-        start += datetime.timedelta(days=time_interval)
-
-    stop_timer = True  # Stop the timer thread
-    timer_thread.join()  # Wait for the timer thread to finish
+
+    # Build the point and 100x100m region collections once; every batch reduces them server-side.
+    points_fc = locations_collection(locations)
+    # The 100x100m region values are only kept for Sentinel-2, so skip them for other datasets.
+    regions_fc = locations_collection(locations, region_radius=50) if dataset_name == "Sentinel-2" else None
+
+    # Use median for Sentinel-2 and mean for ERA5-Land unless another composite is requested
+    composite = _default_composite(composite, dataset_name)
+
+    def fetch_batch(batch):
+        try:
+            return _reduce_intervals(image_collection, batch, time_interval, composite, points_fc, regions_fc,
+                                     scale, parallel_scale)
+        except Exception as e:
+            tqdm.write(f"Error extracting intervals {batch[0]} - {batch[-1]}: {e}")
+            return []
+
+    columns = _output_columns(bands, dataset_name)
+
+    # Batches are independent and bound by Earth Engine latency, so request them concurrently.
+    batches = [interval_starts[first:first + batch_size] for first in range(0, total_intervals, batch_size)]
+    # The progress bar is updated as each batch arrives (and shows its elapsed time) instead of polling.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            tqdm(total=total_intervals, desc=f"[{dataset_name}] Processing time-series", unit="interval") as pbar:
+        for batch, batch_values in zip(batches, executor.map(fetch_batch, batches)):
+            # Index the reduced values by (date, kind, location id).
+            reduced = {}
+            for properties in batch_values:
+                reduced[(properties['Date'], properties['kind'], properties['id'])] = properties
+
+            # Collect the batch column by column (one list per column) rather than as one dict per row.
+            data = {column: [] for column in columns}
+            for date_str in batch:
+                for i, (lat, lon) in enumerate(locations):
+                    values = reduced.get((date_str, 'point', i))
+                    region_values = reduced.get((date_str, 'region', i)) or {}  # Only for Sentinel-2
+
+                    # Store extracted values if available
+                    if values and any(values.get(band) is not None for band in bands):
+                        data["Date"].append(date_str)
+                        data["Latitude"].append(lat)
+                        data["Longitude"].append(lon)
+                        for band in bands:
+                            data[band].append(values.get(band)) # Retrieve values for each index
+                            if dataset_name == "Sentinel-2":
+                                data[f"{band}_region"].append(region_values.get(band)) # Retrieve 100x100m region values
+
+            if data["Date"]:
+                yield data
+
+            # Update progress, showing the number of images in the last interval of the batch.
+            if batch_values:
+                pbar.set_postfix(images=batch_values[-1]['n_images'], refresh=False)
+            pbar.update(len(batch))
 
     total_time = time.time() - start_time  # Final elapsed time
     total_time_str = str(datetime.timedelta(seconds=int(total_time)))
 
-    print(f"\n[{dataset_name}] Time-series extraction completed in {total_time_str}.")  # New line after completion
-    return results
+    print(f"[{dataset_name}] Time-series extraction completed in {total_time_str}.")
 
-def save_to_csv(data, filename="time_series.csv"):
+def export_time_series(image_collection, locations, bands, scale, start_date, dataset_name, bucket=EXPORT_BUCKET,
+                       time_interval=TIME_INTERVAL, composite=None, parallel_scale=PARALLEL_SCALE,
+                       poll_interval=EXPORT_POLL_INTERVAL, filename=None):
     """
-    Saves the extracted time-series data to a CSV file.
+    Exports time-series data to a CSV file in Cloud Storage with an Earth Engine export task.
+
+    Every interval is computed server-side as a single FeatureCollection and written by Earth Engine directly
+    to the bucket, so the results never go through getInfo() (and its payload limits). The function waits
+    for the task to finish. The exported CSV has one row per interval, location and kind of geometry ("point" or,
+    for Sentinel-2, the 100x100m "region"); if filename is given, it is then downloaded and saved there in the
+    same format as extract_time_series (see download_export).
 
     Args:
-        data (list of dict): The time-series data.
+        image_collection (ee.ImageCollection): The image collection to process.
+        locations (list of tuple): List of (latitude, longitude) pairs.
+        bands (list of str): List of bands/indices to extract.
+        scale (int): Spatial resolution (in meters) for extraction.
+        start_date (str): Start date ("YYYY-MM-DD") for time-series extraction.
+        dataset_name (str): Name of the dataset (used for the task name and progress messages).
+        bucket (str, optional): Cloud Storage bucket to export to (defaults to the EE_EXPORT_BUCKET variable).
+        time_interval (int, optional): Number of days for each aggregation interval.
+        composite (str, optional): How each interval is composited (see extract_time_series).
+        parallel_scale (int, optional): Split factor for median and mean composites.
+        poll_interval (float, optional): Seconds between task status checks.
+        filename (str, optional): CSV file where the exported data is saved once downloaded.
+
+    Returns:
+        list of str: The Cloud Storage URIs of the exported files, or None if the export or the download failed.
+    """
+    composite = _default_composite(composite, dataset_name)
+    interval_starts = _interval_starts(start_date, time_interval)
+    regions_fc = locations_collection(locations, region_radius=50) if dataset_name == "Sentinel-2" else None
+    collection = _intervals_collection(image_collection, interval_starts, time_interval, composite,
+                                       locations_collection(locations), regions_fc, scale, parallel_scale)
+
+    # Add the coordinates of each location, looked up server-side from its id.
+    latitudes = ee.List([lat for lat, _ in locations])
+    longitudes = ee.List([lon for _, lon in locations])
+    collection = collection.map(lambda feature: feature.set({
+        'Latitude': latitudes.get(feature.get('id')),
+        'Longitude': longitudes.get(feature.get('id'))
+    }))
+
+    description = f"{dataset_name}_time_series"
+    task = ee.batch.Export.table.toCloudStorage(
+        collection=collection,
+        description=description,
+        bucket=bucket,
+        fileNamePrefix=description,
+        fileFormat='CSV',
+        selectors=['Date', 'kind', 'id', 'Latitude', 'Longitude', *bands]
+    )
+    task.start()
+    print(f"[{dataset_name}] Export task started ({len(interval_starts)} intervals).")
+
+    start_time = time.time()
+    while task.active():
+        time.sleep(poll_interval)
+
+    total_time_str = str(datetime.timedelta(seconds=int(time.time() - start_time)))
+    status = task.status()
+    if status['state'] != 'COMPLETED':
+        print(f"[{dataset_name}] Export task {status['state'].lower()}: {status.get('error_message', '')}")
+        return None
+
+    print(f"[{dataset_name}] Time-series export completed in {total_time_str}.")
+    uris = status.get('destination_uris', [])
+    if filename is not None:
+        try:
+            download_export(uris, filename, bands, dataset_name)
+        except Exception as e:
+            print(f"[{dataset_name}] Error downloading the exported time series: {e}")
+            return None
+    return uris
+
+def download_export(uris, filename, bands, dataset_name):
+    """
+    Downloads the CSV files written by export_time_series and saves them in the format of extract_time_series.
+
+    The exported rows (one per interval, location and kind of geometry) are reshaped into one row per interval
+    and location, with the 100x100m region means as "<band>_region" columns for Sentinel-2, and saved with
+    save_to_csv (CSV plus Parquet copy).
+
+    Args:
+        uris (list of str): The Cloud Storage URIs ("gs://bucket/path") of the exported files.
         filename (str): The output CSV filename.
+        bands (list of str): List of bands/indices exported.
+        dataset_name (str): Name of the dataset.
 
     Returns:
         None
     """
-    if not data:
-        print("No data available to save.")
-        return
+    # The Earth Engine credentials include the Cloud Storage scope.
+    client = storage.Client(project=USER_PROJECT or None, credentials=get_credentials())
+    frames = []
+    for uri in uris:
+        bucket_name, blob_name = uri.removeprefix("gs://").split("/", 1)
+        content = client.bucket(bucket_name).blob(blob_name).download_as_bytes()
+        frames.append(pd.read_csv(BytesIO(content)))
+    exported = pd.concat(frames, ignore_index=True)
+
+    # Keep the points with some value, as extract_time_series does.
+    data = exported[exported["kind"] == "point"].dropna(subset=bands, how="all")
+    if dataset_name == "Sentinel-2":
+        regions = exported.loc[exported["kind"] == "region", ["Date", "id", *bands]]
+        regions = regions.rename(columns={band: f"{band}_region" for band in bands})
+        data = data.merge(regions, on=["Date", "id"], how="left")
+
+    data = data.sort_values(["Date", "id"])[_output_columns(bands, dataset_name)]
+    save_to_csv([data.to_dict("list")], filename)
+
+def save_to_csv(data, filename="time_series.csv"):
+    """
+    Saves the extracted time-series data to a CSV file, plus a Parquet copy with the same name for plotting.
 
-    total_rows = len(data) # Total number of rows to save
-    keys = data[0].keys()
-    with open(filename, "w", newline="") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=keys)
-        writer.writeheader()
+    The data is written batch by batch as it is consumed, so it can be a list of batches or the generator
+    returned by extract_time_series, in which case the batches are saved while the extraction runs.
 
-        # Iterate over data and track progress
-        for i, row in enumerate(data, start=1):
-            writer.writerow(row)
+    Args:
+        data (iterable of dict of list): The time-series data, as batches with one list per column.
+        filename (str): The output CSV filename.
 
-            # Calculate and print progress
-            progress = (i / total_rows) * 100
-            sys.stdout.write(f"\rSaving CSV: {progress:.2f}% complete")  # Overwrite same line
-            sys.stdout.flush()
+    Returns:
+        None
+    """
+    batches = iter(data)
+    first_batch = next(batches, None)
+    if first_batch is None:
+        print("No data available to save.")
+        return
 
-    print("Data saved to {filename}.")
\ No newline at end of file
+    columns = list(first_batch.keys())
+    total_batches = len(data) if hasattr(data, "__len__") else None # Unknown while streaming from a generator
+    # Fixed schema, so batches where a column is entirely empty are still written as floats.
+    schema = pa.schema([("Date", pa.timestamp("ms"))] +
+                       [(column, pa.float64()) for column in columns if column != "Date"])
+
+    # The Parquet copy is read by the plotting functions much faster than the CSV. It is closed last, so it is
+    # never older than the CSV (see plot_time_series.load_time_series).
+    with pq.ParquetWriter(filename.replace(".csv", ".parquet"), schema) as parquet_writer, \
+            open(filename, "w", newline="", buffering=1 << 20) as csvfile:
+        for saved, batch in enumerate(itertools.chain([first_batch], batches), start=1):
+            df = pd.DataFrame(batch, columns=columns)
+            df.to_csv(csvfile, header=saved == 1, index=False)
+
+            df["Date"] = pd.to_datetime(df["Date"])
+            parquet_writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+
+            # Track progress when the number of batches is known (generators report it on their own progress bar).
+            if total_batches:
+                progress = (saved / total_batches) * 100
+                sys.stdout.write(f"\rSaving CSV: {progress:.2f}% complete")  # Overwrite same line
+                sys.stdout.flush()
+
+    print(f"\nData saved to {filename}.")
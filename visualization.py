@@ -1,12 +1,219 @@
 from config import LOCATIONS, ERA5_BANDS
+import ee
 import geemap as ui
+import ipyleaflet
 import webbrowser
+import shutil
 import os
-import ee
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+# Visualization parameters of the map layers, built once at import time.
+FALSE_COLOR_VIS_PARAMS = {
+    'min': 0,
+    'max': 5000,
+    'bands': ['B8', 'B4', 'B3']
+}
+
+# NDVI custom exact palette. Earth Engine spreads the palette colors evenly between min and max and interpolates
+# between them, so every other stop of the original 21-stop ramp is kept: the gradient stays the same with a
+# shorter palette to send and look up for every tile.
+NDVI_RAMP = [
+    [-0.5, '#0c0c0c'], [-0.1, '#dbdbdb'], [0.025, '#fff9cc'],
+    [0.075, '#ddd89b'], [0.125, '#bcb76b'], [0.175, '#a3cc59'],
+    [0.25, '#7fb247'], [0.35, '#609635'], [0.45, '#3f7c23'],
+    [0.55, '#216011'], [1.0, '#004400']
+]
+NDVI_BREAKS, NDVI_PALETTE = zip(*NDVI_RAMP)
+NDVI_VIS_PARAMS = {
+    'min': -0.5,
+    'max': 0.6,
+    'palette': NDVI_PALETTE
+}
+
+# NDMI custom exact palette.
+NDMI_RAMP = [
+    [-0.8, '#800000'],  # Dark red (low moisture)
+    [-0.24, '#ff0000'],  # Bright red (dry area)
+    [-0.032, '#ffff00'],  # Yellow (transition moisture)
+    [0.032, '#00ffff'],  # Cyan (moderate moisture)
+    [0.24, '#0000ff'],  # Bright blue (high moisture)
+    [0.8, '#000080']  # Dark blue (maximum moisture)
+]
+NDMI_BREAKS, NDMI_PALETTE = zip(*NDMI_RAMP)
+NDMI_VIS_PARAMS = {
+    'min': -0.24,
+    'max': 0.24,
+    'palette': NDMI_PALETTE
+}
+
+SWIR_VIS_PARAMS = {
+    'min': 0,
+    'max': 5000,
+    'bands': ['B12', 'B8A', 'B4']
+}
+
+NDWI_VIS_PARAMS = {
+    'min': -1.0,
+    'max': 1.0,
+    'palette': ['#008000', '#FFFFFF', '#0000CC']
+}
+
+NDSI_VIS_PARAMS = {
+    'min': 0.0,
+    'max': 1.0,
+    'palette': ['#0000FF']  # Brilliant blue for snow
+}
+
+# Sentinel-2 L2A Scene Classification Map
+SCL_VIS_PARAMS = {
+    'min': 0,
+    'max': 11,
+    'palette': ['#000000', '#ff0000', '#2f2f2f', '#643200', '#00a000', '#ffe65a', '#0000ff',
+                '#808080', '#c0c0c0', '#ffffff', '#64c8ff', '#ff96ff']
+}
+
+# Sentinel-2 layers added after True Color, in display order: (layer name, visualization parameters, band to
+# select or None to use the whole image).
+SENTINEL_LAYERS = [
+    ('Sentinel-2 False Color', FALSE_COLOR_VIS_PARAMS, None),
+    ('Sentinel-2 NDVI', NDVI_VIS_PARAMS, 'NDVI'),
+    ('Sentinel-2 NDMI', NDMI_VIS_PARAMS, 'NDMI'),
+    ('Sentinel-2 SWIR', SWIR_VIS_PARAMS, None),
+    ('Sentinel-2 NDWI', NDWI_VIS_PARAMS, 'NDWI'),
+    ('Sentinel-2 NDSI', NDSI_VIS_PARAMS, 'NDSI_snow'),  # NDSI of the snow pixels only
+    ('Sentinel-2 Scene Classification', SCL_VIS_PARAMS, 'SCL')
+]
+
+# ERA5-Land soil moisture, dry to wet color scale.
+SOIL_MOISTURE_PALETTE = ['#ffffcc', '#c2e699', '#78c679', '#31a354', '#006837']
+ERA5_VIS_PARAMS = {
+    'min': 0.0,
+    'max': 1.0,
+    'palette': SOIL_MOISTURE_PALETTE
+}
+
+# Half of the side (in meters) of the regions drawn around the locations, and approximate length of a degree of
+# latitude used to convert it to degrees.
+REGION_HALF_SIZE = 50
+METERS_PER_DEGREE = 111320
+
+# Decimal places kept in the coordinates drawn on the map (about 1 m, well below the Sentinel-2 resolution),
+# which keeps the geometries sent to Earth Engine and embedded in the HTML small.
+COORDINATE_DECIMALS = 5
+
+# Tile URLs of the layers already requested in this session, keyed by serialized image and visualization
+# parameters (see get_tile_url).
+_TILE_URL_CACHE = {}
+MAX_MAP_ID_WORKERS = 8 # Number of map IDs requested concurrently
+
+# Optional JSON file mapping layer names to the {z}/{x}/{y} URL templates of pre-rendered tile pyramids (e.g.
+# Cloud Optimized GeoTIFFs with overviews served by a tile server). Those layers are loaded from these tiles
+# instead of being rendered by Earth Engine.
+PRERENDERED_TILES_FILE = os.environ.get("MAP_TILES_FILE")
+
+def _load_prerendered_tiles(filename):
+    """
+    Loads the tile URL templates of the pre-rendered layers.
+
+    Args:
+        filename (str): Path to a JSON file with a {layer name: tile URL template} object, or None.
+
+    Returns:
+        dict: The tile URL template of each pre-rendered layer; empty if there is no file or it cannot be read.
+    """
+    if not filename:
+        return {}
+    try:
+        with open(filename, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error loading the pre-rendered tiles from '{filename}': {e}")
+        return {}
+
+PRERENDERED_TILE_URLS = _load_prerendered_tiles(PRERENDERED_TILES_FILE)
+
+# Google Chrome, looked up on the PATH with the default Windows install as fallback, and registered once as the
+# browser used by open_map. If Chrome is not installed, the default browser is used instead.
+CHROME_PATH = shutil.which("chrome") or shutil.which("google-chrome") \
+    or r"C:\Program Files\Google\Chrome\Application\chrome.exe"
+try:
+    _BROWSER = webbrowser.get(f'"{CHROME_PATH}" %s') if os.path.exists(CHROME_PATH) else webbrowser.get()
+except webbrowser.Error:
+    _BROWSER = None # No usable browser; open_map reports it
+
+def get_tile_url(image, vis_params):
+    """
+    Returns the tile URL of an Earth Engine image, reusing it if it was already requested.
+
+    The image is styled server-side with visualize and its map ID is requested once per image and visualization
+    parameters, so building the map again in the same session skips the getMapId round-trips. Image collections
+    are mosaicked first, as geemap does when adding them as layers.
+
+    Args:
+        image (ee.Image or ee.ImageCollection): The image to display.
+        vis_params (dict): Visualization parameters (min, max, bands, palette...).
+
+    Returns:
+        str: The tile URL template of the styled image.
+    """
+    if isinstance(image, ee.ImageCollection):
+        image = image.mosaic()
+    key = (image.serialize(), json.dumps(vis_params, sort_keys=True))
+    url = _TILE_URL_CACHE.get(key)
+    if url is None:
+        url = image.visualize(**vis_params).getMapId()['tile_fetcher'].url_format
+        _TILE_URL_CACHE[key] = url
+    return url
+
+def add_cached_ee_layers(m, layers, max_workers=MAX_MAP_ID_WORKERS):
+    """
+    Adds several Earth Engine images to the map as tile layers, requesting their map IDs concurrently.
+
+    The layers are added in the given order once every tile URL is available. Layers listed in
+    PRERENDERED_TILE_URLS use their pre-rendered tiles and need no map ID.
+
+    Args:
+        m (geemap.Map): The map object where the layers will be added.
+        layers (list of tuple): (image, vis_params, name, shown) for each layer.
+        max_workers (int, optional): Number of concurrent map ID requests.
+
+    Returns:
+        None
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        urls = list(executor.map(
+            lambda layer: PRERENDERED_TILE_URLS.get(layer[2]) or get_tile_url(layer[0], layer[1]), layers))
+
+    for (_, _, name, shown), url in zip(layers, urls):
+        m.add_tile_layer(url, name=name, attribution="Google Earth Engine", shown=shown)
+
+def _region_polygon(lat, lon, half_size=REGION_HALF_SIZE):
+    """
+    Computes the ring of a square of the given half-size (in meters) centered on a point.
+
+    Args:
+        lat (float): Latitude of the center.
+        lon (float): Longitude of the center.
+        half_size (float, optional): Half of the side of the square, in meters.
+
+    Returns:
+        list of list: The closed ring of [longitude, latitude] corners of the square, rounded to
+                      COORDINATE_DECIMALS.
+    """
+    dlat = half_size / METERS_PER_DEGREE
+    dlon = half_size / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+    west, east = round(lon - dlon, COORDINATE_DECIMALS), round(lon + dlon, COORDINATE_DECIMALS)
+    south, north = round(lat - dlat, COORDINATE_DECIMALS), round(lat + dlat, COORDINATE_DECIMALS)
+    return [[west, south], [east, south], [east, north], [west, north], [west, south]]
 
 def add_rectangles_to_map(m, locations):
     """
-    Adds 100x100 meter rectangles around each specified location on the map.
+    Adds 100x100 meter rectangles around each specified location on the map, as a single layer.
+
+    The rectangles are drawn client-side as a GeoJSON vector layer, so they need no Earth Engine request and
+    render immediately; they match the regions used to extract the averaged values.
 
     Args:
         m (geemap.Map): The map object where the rectangles will be added.
@@ -15,11 +222,35 @@ def add_rectangles_to_map(m, locations):
     Returns:
         None
     """
-    for lat, lon in locations:
-        region = ee.Geometry.Rectangle([
-            lon - 0.00045, lat - 0.00045, lon + 0.00045, lat + 0.00045
-        ])
-        m.addLayer(region, {'color': 'blue'}, f"100x100m Area ({lat}, {lon})")
+    features = [{
+        "type": "Feature",
+        "properties": {"name": f"100x100m Area ({lat:.{COORDINATE_DECIMALS}f}, {lon:.{COORDINATE_DECIMALS}f})"},
+        "geometry": {"type": "Polygon", "coordinates": [_region_polygon(lat, lon)]}
+    } for lat, lon in locations]
+    m.add_geojson({"type": "FeatureCollection", "features": features}, layer_name="100x100m Areas",
+                  style={'color': 'blue', 'weight': 2, 'fillOpacity': 0.1}, info_mode=None)
+
+def add_markers_to_map(m, locations):
+    """
+    Adds a red circle marker at each specified location on the map, as a single layer.
+
+    The markers are drawn client-side as a GeoJSON vector layer, so they need no Earth Engine request.
+
+    Args:
+        m (geemap.Map): The map object where the markers will be added.
+        locations (list of tuple): A list of geographic points (latitude, longitude) to mark.
+
+    Returns:
+        None
+    """
+    features = [{
+        "type": "Feature",
+        "properties": {},
+        "geometry": {"type": "Point",
+                     "coordinates": [round(lon, COORDINATE_DECIMALS), round(lat, COORDINATE_DECIMALS)]}
+    } for lat, lon in locations]
+    m.add(ipyleaflet.GeoJSON(data={"type": "FeatureCollection", "features": features}, name="Points",
+                             point_style={'radius': 4, 'color': 'red', 'fillColor': 'red', 'fillOpacity': 1}))
 
 def create_map(center_coords, sentinel_collection, era5_collection, vis_params):
     """
@@ -31,118 +262,38 @@ def create_map(center_coords, sentinel_collection, era5_collection, vis_params):
 
     Args:
         center_coords (list): A list containing the map's center coordinates [latitude, longitude].
-        sentinel_collection (ee.Image): Cloud-masked Sentinel-2 composite image.
-        era5_collection (ee.Image): Processed ERA5-Land composite image.
+        sentinel_collection (ee.Image): Cloud-masked Sentinel-2 composite image, with the NDSI_snow band
+                                        (see get_preview_composite).
+        era5_collection (ee.ImageCollection): ERA5-Land collection for the map period.
         vis_params (dict): Visualization parameters for the Sentinel-2 True Color layer.
 
     Returns:
         geemap.Map: A map object with all added layers and controls.
     """
-    # Create a map object centered at center_coords, with a zoom level of 10 and nearly full height.
-    m = ui.Map(center=center_coords, zoom=10, height="98vh") # Create a map object.
-
-    # Add Sentinel-2 True Color layer.
-    m.add_ee_layer(sentinel_collection, vis_params, 'Sentinel-2 True Color') # Add the cloud-masked image to the map
-
-    # Add Sentinel-2 False Color visualization.
-    falsecolor = {
-        'min': 0,
-        'max': 5000,
-        'bands': ['B8', 'B4', 'B3']
-    }
-    m.add_ee_layer(sentinel_collection, falsecolor, 'Sentinel-2 False Color')
-
-    # NDVI Visualization using a custom exact palette.
-    ndvi_ramp = [
-        [-0.5, '#0c0c0c'], [-0.2, '#bfbfbf'], [-0.1, '#dbdbdb'],
-        [0.0, '#eaeaea'], [0.025, '#fff9cc'], [0.05, '#ede8b5'],
-        [0.075, '#ddd89b'], [0.1, '#ccc682'], [0.125, '#bcb76b'],
-        [0.15, '#afc160'], [0.175, '#a3cc59'], [0.2, '#91bf51'],
-        [0.25, '#7fb247'], [0.3, '#70a33f'], [0.35, '#609635'],
-        [0.4, '#4f892d'], [0.45, '#3f7c23'], [0.5, '#306d1c'],
-        [0.55, '#216011'], [0.6, '#0f540a'], [1.0, '#004400']
-    ]
-    ndvi_breaks, ndvi_palette = zip(*ndvi_ramp)
-    ndvi_vis_params = {
-        'min': -0.5,
-        'max': 0.6,
-        'palette': ndvi_palette
-    }
-    m.add_ee_layer(sentinel_collection.select('NDVI'), ndvi_vis_params, 'Sentinel-2 NDVI')
-
-    # NDMI Visualization using a custom exact palette.
-    ndmi_ramp = [
-        [-0.8, '#800000'],  # Dark red (low moisture)
-        [-0.24, '#ff0000'],  # Bright red (dry area)
-        [-0.032, '#ffff00'],  # Yellow (transition moisture)
-        [0.032, '#00ffff'],  # Cyan (moderate moisture)
-        [0.24, '#0000ff'],  # Bright blue (high moisture)
-        [0.8, '#000080']  # Dark blue (maximum moisture)
-    ]
-    ndmi_breaks, ndmi_palette = zip(*ndmi_ramp)
-    ndmi_vis_params = {
-        'min': -0.24,
-        'max': 0.24,
-        'palette': ndmi_palette
-    }
-    m.add_ee_layer(sentinel_collection.select('NDMI'), ndmi_vis_params, 'Sentinel-2 NDMI')
-
-    # SWIR Visualization
-    swir_vis_params = {
-        'min': 0,
-        'max': 5000,
-        'bands': ['B12', 'B8A', 'B4']
-    }
-    m.add_ee_layer(sentinel_collection, swir_vis_params, 'Sentinel-2 SWIR')
-
-    # NDWI Visualization
-    ndwi_vis_params = {
-        'min': -1.0,
-        'max': 1.0,
-        'palette': ['#008000', '#FFFFFF', '#0000CC']
-    }
-    m.add_ee_layer(sentinel_collection.select('NDWI'), ndwi_vis_params, 'Sentinel-2 NDWI')
-
-    # NDSI Visualization with a snow mask.
-    ndsi = sentinel_collection.select('NDSI')
-    snow_mask = ndsi.gte(0.4)  # Consider snow when NDSI > 0.4
-    ndsi_masked = ndsi.updateMask(snow_mask)
-    ndsi_vis_params = {
-        'min': 0.0,
-        'max': 1.0,
-        'palette': ['#0000FF']  # Brilliant blue for snow
-    }
-    m.add_ee_layer(ndsi_masked, ndsi_vis_params, 'Sentinel-2 NDSI')
-
-    # Sentinel-2 L2A Scene Classification Map
-    scl_vis_params = {
-        'min': 0,
-        'max': 11,
-        'palette': ['#000000', '#ff0000', '#2f2f2f', '#643200', '#00a000', '#ffe65a', '#0000ff',
-                    '#808080', '#c0c0c0', '#ffffff', '#64c8ff', '#ff96ff']
-    }
-    m.add_ee_layer(sentinel_collection.select('SCL'), scl_vis_params, 'Sentinel-2 Scene Classification')
-
-    # ERA5-Land Soil Moisture Visualization
-    soil_moisture_palette = ['#ffffcc', '#c2e699', '#78c679', '#31a354', '#006837']  # Dry to wet color scale
-
-    for i, band in enumerate(ERA5_BANDS):
-        era5_vis_params = {
-            'min': 0.0,
-            'max': 1.0,
-            'palette': soil_moisture_palette
-        }
-        m.add_ee_layer(era5_collection.select(band), era5_vis_params, f"ERA5-Land {band}")
-
-    # Add location markers
-    for lat, lon in LOCATIONS:
-        point = ee.Geometry.Point([lon, lat])  # Create a point geometry
-        feature = ee.Feature(point)  # Convert to an EE Feature
-        feature_collection = ee.FeatureCollection([feature])  # Wrap in a FeatureCollection
-
-        # Add the marker to the map
-        marker_style = {'color': 'red'}  # Marker style (red points)
-        m.addLayer(feature_collection, marker_style, f"Point ({lat}, {lon})")
+    # Create a map object centered at center_coords, with a zoom level of 10 and nearly full height. Vector
+    # layers are drawn on a single canvas instead of one SVG element per feature.
+    m = ui.Map(center=center_coords, zoom=10, height="98vh", prefer_canvas=True) # Create a map object.
+
+    # Sentinel-2 True Color layer, the only one visible when the map loads.
+    layers = [(sentinel_collection, vis_params, 'Sentinel-2 True Color', True)]
+
+    # The rest of the Sentinel-2 layers, all derived from the same composite image. They start hidden, so
+    # their tiles are only requested when they are enabled in the layer control.
+    for name, layer_vis_params, band in SENTINEL_LAYERS:
+        layer = sentinel_collection.select(band) if band else sentinel_collection
+        layers.append((layer, layer_vis_params, name, False))
+
+    # ERA5-Land Soil Moisture Visualization (hidden until enabled). The collection is mosaicked once, so every band
+    # layer visualizes the same backing image and they share a single Earth Engine graph node.
+    era5_image = era5_collection.select(ERA5_BANDS).mosaic()
+    for band in ERA5_BANDS:
+        layers.append((era5_image, dict(ERA5_VIS_PARAMS, bands=[band]), f"ERA5-Land {band}", False))
+
+    # Request every map ID concurrently and add the layers in order.
+    add_cached_ee_layers(m, layers)
+
+    # Add the location markers as a single layer.
+    add_markers_to_map(m, LOCATIONS)
 
     # Add 100x100 meter rectangles around the locations.
     add_rectangles_to_map(m, LOCATIONS)
@@ -163,14 +314,15 @@ def save_map(m, filename):
         str: The absolute path to the saved HTML file.
     """
     html_file = os.path.abspath(filename)
-    m.to_html(html_file, width="100%", height="98vh")
-    m.save(html_file)
+    # Render the widget straight into a single buffered file handle, with a page title.
+    with open(html_file, "w", encoding="utf-8", buffering=1 << 20) as f:
+        m.save(f, title="SatAsAService map")
     print(f"Map saved as '{html_file}'")
     return html_file
 
 def open_map(html_file):
     """
-    Opens the specified HTML file in Google Chrome.
+    Opens the specified HTML file in Google Chrome, or in the default browser if Chrome is not installed.
 
     Args:
         html_file (str): The absolute path to the HTML file.
@@ -178,9 +330,8 @@ def open_map(html_file):
     Returns:
         None
     """
-    chrome_path = r"C:\Program Files\Google\Chrome\Application\chrome.exe" # Root to Google Chrome
     try:
-        browser = webbrowser.get(f'"{chrome_path}" %s')
-        browser.open(f'file://{html_file}')
+        if _BROWSER is None or not _BROWSER.open(f'file://{html_file}'):
+            print(f"Could not open the map in a browser; open '{html_file}' manually.")
     except Exception as e:
-        print(f"Error opening the map: {e}")
\ No newline at end of file
+        print(f"Error opening the map: {e}")